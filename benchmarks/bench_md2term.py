@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for md2term's rendering hot paths.
+
+Each benchmark renders a generated document to an in-memory console and
+reports the best of several runs, so results are comparable between commits.
+
+Usage:
+    python benchmarks/bench_md2term.py            # run every benchmark
+    python benchmarks/bench_md2term.py plain      # run benchmarks matching "plain"
+"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Sequence
+
+from rich.console import Console
+from rich.text import Text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import md2term  # noqa: E402
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {}
+
+
+def benchmark(func: Callable[[], None]) -> Callable[[], None]:
+    """Register a benchmark under its function name."""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def make_console(width: int = 80) -> Console:
+    """Create a console that renders into memory like a 256-color terminal."""
+    return Console(
+        file=io.StringIO(),
+        width=width,
+        force_terminal=True,
+        color_system="256",
+        legacy_windows=False,
+    )
+
+
+def report(name: str, func: Callable[[], None], units: float, unit: str) -> None:
+    """Time a callable and print seconds per run and throughput."""
+    best = min(timeit.repeat(func, number=1, repeat=5))
+    print(f"{name:<40} {best * 1000:9.2f} ms  {units / best:12,.0f} {unit}/s")
+
+
+PROSE = "\n\n".join(
+    "The quick brown fox jumps over the lazy dog while the server logs "
+    f"request {i} as completed in {i % 97} milliseconds without any errors."
+    for i in range(2000)
+)
+
+# Mostly prose, with inline markup in every tenth paragraph
+LIGHTLY_FORMATTED = "\n\n".join(
+    paragraph + (" See **note** and `config`." if i % 10 == 0 else "")
+    for i, paragraph in enumerate(PROSE.split("\n\n"))
+)
+
+
+@benchmark
+def plain_text() -> None:
+    """Plain prose through the fast path versus the full pipeline."""
+    size = len(PROSE) / 1024
+    report(
+        "plain_text: fast path",
+        lambda: md2term.render_markdown(make_console(), PROSE),
+        size,
+        "KiB",
+    )
+    report(
+        "plain_text: full pipeline",
+        lambda: md2term.TerminalRenderer(make_console()).render_blocks(
+            md2term.parse_blocks(PROSE)
+        ),
+        size,
+        "KiB",
+    )
+    size = len(LIGHTLY_FORMATTED) / 1024
+    report(
+        "plain_text: lightly formatted, fast path",
+        lambda: md2term.render_markdown(make_console(), LIGHTLY_FORMATTED),
+        size,
+        "KiB",
+    )
+    report(
+        "plain_text: lightly formatted, full",
+        lambda: md2term.TerminalRenderer(make_console()).render_blocks(
+            md2term.parse_blocks(LIGHTLY_FORMATTED)
+        ),
+        size,
+        "KiB",
+    )
+
+
+INLINE_DENSE = "\n\n".join(
+    f"Item {i}: **bold with _nested *emphasis*_ and `code`** then "
+    f"[a **strong** link](https://example.com/{i}) and *more _nested_ text* "
+    "with ``spans`` plus **_bold italic_** words."
+    for i in range(500)
+)
+
+
+def nested_text_render(inlines: Sequence[md2term.Inline]) -> Text:
+    """Reference implementation: one ``Text`` per nesting level, then stylize."""
+    text = Text()
+    for inline in inlines:
+        if inline.kind == "text":
+            text.append(inline.text)
+        elif inline.kind in ("emphasis", "strong"):
+            child_text = nested_text_render(inline.children)
+            child_text.stylize("italic" if inline.kind == "emphasis" else "bold")
+            text.append_text(child_text)
+        elif inline.kind == "codespan":
+            text.append(inline.text, style="bold red on black")
+        elif inline.kind == "link":
+            link_text = nested_text_render(inline.children)
+            link_text.stylize("bold blue underline")
+            text.append_text(link_text)
+            text.append(f" ({inline.url})", style="dim blue")
+        elif inline.kind == "softbreak":
+            text.append(" ")
+    return text
+
+
+@benchmark
+def inline_dense() -> None:
+    """Inline rendering of nested markup: style stack versus nested Text."""
+    paragraphs = [
+        block.children
+        for block in md2term.parse_blocks(INLINE_DENSE)
+        if isinstance(block, md2term.Paragraph)
+    ]
+    renderer = md2term.TerminalRenderer(make_console())
+
+    def style_stack() -> None:
+        for children in paragraphs:
+            renderer._render_inline_tokens(children)
+
+    def nested() -> None:
+        for children in paragraphs:
+            nested_text_render(children)
+
+    report("inline_dense: style stack", style_stack, len(paragraphs), "paragraphs")
+    report("inline_dense: nested Text", nested, len(paragraphs), "paragraphs")
+
+
+CHECKLIST = "\n".join(
+    f"- [ ] task {i}: review **module {i}** and `fix` its issues\n"
+    f"  - subtask {i}.1\n  - subtask {i}.2"
+    for i in range(3334)
+)
+
+
+@benchmark
+def checklist() -> None:
+    """A 10k-item generated checklist with nested items."""
+    blocks = md2term.parse_blocks(CHECKLIST)
+    report(
+        "checklist: render lists",
+        lambda: md2term.TerminalRenderer(make_console()).render_blocks(blocks),
+        3334 * 3,
+        "items",
+    )
+
+
+STREAMED = "\n\n".join(
+    f"## Step {i}\n\nThe agent reads file {i} and reports on it.\n\n"
+    f"- item {i}\n- another item\n\n```python\nprint({i})\n```"
+    for i in range(400)
+)
+
+
+@benchmark
+def stream_buffer() -> None:
+    """Buffer bookkeeping for a response streamed one character at a time."""
+    renderer = md2term.StreamingRenderer(make_console())
+
+    def feed() -> None:
+        renderer.buffer = ""
+        # Drawing is excluded; this measures accumulation and completeness checks
+        renderer._render_current_state = lambda: None  # type: ignore[method-assign]
+        for char in STREAMED:
+            renderer.add_text(char)
+
+    report("stream_buffer: per character", feed, len(STREAMED) / 1024, "KiB")
+
+
+FENCE_LANGUAGES = ["python", "js", "bash", "mermaid", "text", "yaml", "diff", "c++"]
+
+
+@benchmark
+def line_stream() -> None:
+    """A response streamed a line at a time, with a frame per line."""
+    text = STREAMED[:2000]
+    lines = text.splitlines(keepends=True)
+
+    def stream(split_blocks: bool) -> Callable[[], None]:
+        def run() -> None:
+            renderer = md2term.StreamingRenderer(
+                make_console(), split_blocks=split_blocks
+            )
+            for line in lines:
+                renderer.add_text(line)
+                renderer._render_current_state()
+            renderer.finalize()
+
+        return run
+
+    report("line_stream: redraw everything", stream(False), len(lines), "lines")
+    report("line_stream: redraw open block", stream(True), len(lines), "lines")
+
+
+# Paragraphs linking to references defined further down, as answers with
+# a list of sources at the end do
+REFERENCED = "".join(
+    f"Step {i} follows [the guide][guide-{i % 20}] and [spec {i % 7}].\n\n"
+    for i in range(300)
+) + "".join(f"[guide-{i}]: https://example.com/guide/{i}\n" for i in range(20))
+
+
+@benchmark
+def reference_index() -> None:
+    """Parsing a growing document for every frame: whole versus incremental."""
+    chunks = [REFERENCED[i : i + 400] for i in range(0, len(REFERENCED), 400)]
+
+    def whole() -> None:
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            md2term.parse_blocks(text)
+
+    def incremental() -> None:
+        document = md2term.IncrementalParser()
+        for chunk in chunks:
+            document.feed(chunk)
+            document.blocks()
+
+    size = len(REFERENCED) / 1024
+    report("reference_index: whole document", whole, size, "KiB")
+    report("reference_index: incremental", incremental, size, "KiB")
+
+
+# A loose list is held by the block splitter until it ends
+LOOSE_LIST = "".join(
+    f"- Item {i} with **bold** text and a [link](https://example.com/{i})\n\n"
+    for i in range(500)
+)
+
+
+@benchmark
+def loose_list() -> None:
+    """A long loose list: one parse versus split by line and streamed."""
+    lines = LOOSE_LIST.splitlines(keepends=True)
+    chunks = [LOOSE_LIST[i : i + 400] for i in range(0, len(LOOSE_LIST), 400)]
+
+    def whole() -> None:
+        md2term.parse_blocks(LOOSE_LIST)
+
+    def split() -> None:
+        splitter = md2term.BlockSplitter()
+        for line in lines:
+            splitter.feed(line)
+        splitter.close()
+
+    def frames() -> None:
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            md2term.parse_blocks(text)
+
+    def incremental() -> None:
+        document = md2term.IncrementalParser()
+        for chunk in chunks:
+            document.feed(chunk)
+            document.blocks()
+
+    size = len(LOOSE_LIST) / 1024
+    report("loose_list: one parse", whole, size, "KiB")
+    report("loose_list: split by line", split, size, "KiB")
+    report("loose_list: whole document per frame", frames, size, "KiB")
+    report("loose_list: incremental per frame", incremental, size, "KiB")
+
+
+@benchmark
+def lexer_resolution() -> None:
+    """Lexer lookup for fence info strings, cached versus by name every time."""
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+
+    def by_name() -> None:
+        for name in FENCE_LANGUAGES:
+            try:
+                get_lexer_by_name(name, stripnl=False, ensurenl=True, tabsize=4)
+            except ClassNotFound:
+                pass
+
+    def cached() -> None:
+        for name in FENCE_LANGUAGES:
+            md2term._resolve_lexer(name)
+
+    count = len(FENCE_LANGUAGES)
+    report("lexer_resolution: by name", by_name, count, "lookups")
+    report("lexer_resolution: cached", cached, count, "lookups")
+
+
+UNLABELED_CODE = [
+    "#!/usr/bin/env python3\nimport sys\nprint(sys.argv)\n" * 20,
+    '{\n  "name": "md2term",\n  "version": "1.0"\n}\n',
+    "$ pip install md2term\n$ md2term README.md\n",
+    "The quick brown fox jumps over the lazy dog.\n" * 20,
+]
+
+
+@benchmark
+def guess_language() -> None:
+    """Language guessing for unlabeled fences: hints versus Pygments."""
+    from pygments.lexers import guess_lexer
+
+    def hints() -> None:
+        for code in UNLABELED_CODE:
+            md2term.guess_language(code)
+
+    def pygments() -> None:
+        for code in UNLABELED_CODE:
+            guess_lexer(code)
+
+    count = len(UNLABELED_CODE)
+    report("guess_language: first-line hints", hints, count, "blocks")
+    report("guess_language: pygments guess_lexer", pygments, count, "blocks")
+
+
+AGENT_TRANSCRIPT = STREAMED[:600]
+
+
+@benchmark
+def compositor() -> None:
+    """40 frames over 8 streamed regions, one changing per frame."""
+
+    def frames(redraw_all: bool) -> Callable[[], None]:
+        def run() -> None:
+            comp = md2term.StreamCompositor(make_console(), frame_interval=0)
+            regions = [comp.add_region(f"agent {i}", height=6) for i in range(8)]
+            for region in regions:
+                comp.add_text(region, AGENT_TRANSCRIPT)
+            for i in range(40):
+                if redraw_all:
+                    for region in comp.regions:
+                        region.dirty = True
+                comp.add_text(regions[i % 8], f"token {i} ")
+
+        return run
+
+    report("compositor: changed regions only", frames(False), 40, "frames")
+    report("compositor: every region per frame", frames(True), 40, "frames")
+
+
+@benchmark
+def color_systems() -> None:
+    """A document with code, lists and headings in each color system."""
+    size = len(STREAMED) / 1024
+    for name in ("none", "16", "256", "truecolor"):
+        color_system = md2term.COLOR_SYSTEMS[name]
+
+        def run() -> None:
+            # As in a fresh process, nothing has been highlighted yet
+            md2term._HIGHLIGHT_CACHE.clear()
+            console = md2term.make_console(80, color_system, io.StringIO())
+            md2term.render_markdown(console, STREAMED)
+
+        report(f"color_systems: {name}", run, size, "KiB")
+
+    def rich_console() -> None:
+        md2term._HIGHLIGHT_CACHE.clear()
+        md2term.render_markdown(make_console(), STREAMED)
+
+    report("color_systems: 256, plain Rich console", rich_console, size, "KiB")
+
+
+class CountingDevNull(io.RawIOBase):
+    """A raw file that discards its data and counts the writes reaching it."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes = 0
+        self.fd = os.open(os.devnull, os.O_WRONLY)
+
+    def writable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def write(self, data) -> int:  # type: ignore[no-untyped-def]
+        self.writes += 1
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            os.close(self.fd)
+        super().close()
+
+
+@benchmark
+def frame_writes() -> None:
+    """A streamed response drawn to a file, counting the writes per frame."""
+    text = STREAMED[:2000]
+    chunks = [text[i : i + 100] for i in range(0, len(text), 100)]
+
+    def stream(direct: bool) -> int:
+        raw = CountingDevNull()
+        write = os.write
+
+        def counting_write(fd: int, data: bytes) -> int:
+            raw.writes += 1
+            return write(fd, data)
+
+        output = io.TextIOWrapper(io.BufferedWriter(raw), encoding="utf-8")
+        if direct:
+            console = md2term.make_console(80, "256", output)
+        else:
+            console = Console(
+                file=output, width=80, force_terminal=True, color_system="256"
+            )
+        md2term.os.write = counting_write  # type: ignore[attr-defined]
+        try:
+            renderer = md2term.StreamingRenderer(console)
+            for chunk in chunks:
+                renderer.add_text(chunk)
+                renderer._render_current_state()
+            renderer.finalize()
+        finally:
+            md2term.os.write = write  # type: ignore[attr-defined]
+            output.close()
+        return raw.writes
+
+    for name, direct in (("file.write", False), ("os.write", True)):
+        writes = stream(direct)
+        report(
+            f"frame_writes: {name}, {writes} writes",
+            lambda: stream(direct),
+            len(chunks),
+            "frames",
+        )
+
+
+# Common CJK ideographs and hiragana, in a fixed pseudo-random order
+CJK_CHARS = [chr(0x4E00 + (i * 7919) % 6000) for i in range(6000)] + [
+    chr(c) for c in range(0x3041, 0x3097)
+]
+
+
+def cjk_sentence(seed: int, length: int) -> str:
+    """A run of CJK characters ending in an ideographic full stop."""
+    return (
+        "".join(CJK_CHARS[(seed * 31 + i * 17) % len(CJK_CHARS)] for i in range(length))
+        + "。"
+    )
+
+
+CJK = "\n\n".join(
+    f"## 第{i}章 📝\n\n{cjk_sentence(i, 60)} **{cjk_sentence(i + 1, 8)}** "
+    f"`コード` {cjk_sentence(i + 2, 50)}\n\n- {cjk_sentence(i + 3, 30)}\n"
+    f"- ✅ {cjk_sentence(i + 4, 60)}\n\n| 名前 | 説明 |\n|---|---|\n"
+    f"| {cjk_sentence(i + 5, 4)} | {cjk_sentence(i + 6, 12)} |"
+    for i in range(300)
+)
+
+
+@benchmark
+def cjk() -> None:
+    """A large CJK document: rendering, and measuring its output lines."""
+    from rich.cells import cell_len
+
+    size = len(CJK) / 1024
+    report(
+        "cjk: render",
+        lambda: md2term.render_markdown(make_console(), CJK),
+        size,
+        "KiB",
+    )
+
+    console = make_console()
+    md2term.render_markdown(console, CJK)
+    output = console.file.getvalue()  # type: ignore[attr-defined]
+    renderer = md2term.StreamingRenderer(make_console())
+    renderer._record_output(output)
+    lines = output.count("\n")
+
+    def rich_widths() -> None:
+        sum((cell_len(line) - 1) // 80 + 1 for line in output.split("\n"))
+
+    # What each streamed frame does to erase the previous one
+    report("cjk: rows on screen, cell_len", rich_widths, lines, "lines")
+    report(
+        "cjk: rows on screen, md2term",
+        lambda: renderer._output_rows(80),
+        lines,
+        "lines",
+    )
+
+
+# A recorded stream: the first steps of STREAMED in 40-character chunks
+TRACE = "".join(
+    json.dumps({"t": i * 0.01, "text": STREAMED[start : start + 40]}) + "\n"
+    for i, start in enumerate(range(0, 4000, 40))
+)
+
+
+@benchmark
+def replay() -> None:
+    """A recorded trace replayed as fast as possible."""
+
+    def run() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            md2term.replay_trace(io.StringIO(TRACE), width=80, speed=None)
+
+    report("replay: 100 chunks at max speed", run, 100, "chunks")
+
+
+CHAT_RECORDS = "".join(
+    json.dumps(
+        {
+            "id": i,
+            "markdown": f"**Assistant**: here is step {i}.\n\n"
+            f"- read `file_{i}.py`\n- run the tests\n\n"
+            f"```python\nprint({i})\n```\n",
+        }
+    )
+    + "\n"
+    for i in range(2000)
+)
+
+
+@benchmark
+def jsonl() -> None:
+    """Bulk rendering of 2000 short chat messages as JSONL records."""
+
+    def bulk(jobs: int) -> Callable[[], None]:
+        return lambda: md2term.process_jsonl(
+            io.StringIO(CHAT_RECORDS), io.StringIO(), jobs=jobs
+        )
+
+    def process_per_doc() -> None:
+        # What a caller pays without bulk mode: start md2term for every document
+        for line in CHAT_RECORDS.splitlines()[:20]:
+            subprocess.run(
+                [sys.executable, md2term.__file__],
+                input=json.loads(line)["markdown"],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+
+    report("jsonl: in process", bulk(1), 2000, "docs")
+    report("jsonl: 4 jobs", bulk(4), 2000, "docs")
+    report("jsonl: one process per doc", process_per_doc, 20, "docs")
+
+
+@benchmark
+def shared_renderer() -> None:
+    """500 chat messages through one AnsiRenderer, serially and from threads."""
+    messages = [
+        json.loads(line)["markdown"] for line in CHAT_RECORDS.splitlines()[:500]
+    ]
+    renderer = md2term.AnsiRenderer()
+
+    def serial() -> None:
+        for message in messages:
+            renderer.render(message)
+
+    def threads() -> None:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(renderer.render, messages))
+
+    report("shared_renderer: one thread", serial, len(messages), "docs")
+    report("shared_renderer: 8 threads", threads, len(messages), "docs")
+
+
+def main() -> None:
+    """Run the benchmarks selected on the command line."""
+    patterns = sys.argv[1:]
+    for name, func in BENCHMARKS.items():
+        if not patterns or any(pattern in name for pattern in patterns):
+            func()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,60 @@ import shutil
 import re
 import time
 import io
-from typing import Optional, TextIO, List, Dict, Any
+import os
+import codecs
+import functools
+import itertools
+import json
+import signal
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
 from io import StringIO
 
 import mistune
+from mistune.util import unikey
 import rich_click as click
+from rich.color import ColorSystem
 from rich.console import Console
-from rich.text import Text
+from rich.control import STRIP_CONTROL_CODES, Control, strip_control_codes
+from rich.style import Style
+from rich.text import Span, Text
 from rich.syntax import Syntax
 from rich.rule import Rule
 from rich.panel import Panel
+from pygments.lexer import Lexer  # type: ignore
+from pygments.lexers import get_lexer_by_name  # type: ignore
+from pygments.util import ClassNotFound  # type: ignore
+from rich.cells import get_character_cell_size, set_cell_size
+from rich.segment import ControlType, Segment, Segments
+
+# Private Rich helpers, checked against the minimum Rich version; without
+# them, widths are measured character by character and the fast path is off
+try:
+    from rich.cells import _is_single_cell_widths
+except ImportError:  # pragma: no cover
+    _is_single_cell_widths = frozenset(map(chr, range(0x20, 0x7F))).issuperset
+try:
+    from rich._wrap import divide_line
+except ImportError:  # pragma: no cover
+    divide_line = None  # type: ignore[assignment]
 
 # Configure rich-click for better readability
 click.rich_click.USE_RICH_MARKUP = True
@@ -26,402 +70,2100 @@ click.rich_click.STYLE_HELPTEXT = ""  # Remove dim styling from help text
 __version__ = "1.0.2"
 
 
+# Block model
+#
+# mistune hands us nested ``Dict[str, Any]`` tokens.  They are converted once
+# into the small immutable classes below, which are cheap to compare and hash
+# (so rendered output can be cached per block) and use far less memory than
+# the dicts they replace.
+
+
+@dataclass(frozen=True)
+class Inline:
+    """An inline span: text, emphasis, strong, codespan, link, image or break."""
+
+    __slots__ = ("kind", "text", "url", "children")
+    kind: str
+    text: str
+    url: str
+    children: Tuple["Inline", ...]
+
+
+@dataclass(frozen=True)
+class Heading:
+    """An ATX or setext heading."""
+
+    __slots__ = ("level", "children")
+    level: int
+    children: Tuple[Inline, ...]
+
+
+@dataclass(frozen=True)
+class Paragraph:
+    """A paragraph of inline content."""
+
+    __slots__ = ("children",)
+    children: Tuple[Inline, ...]
+
+
+@dataclass(frozen=True)
+class BlockText:
+    """Inline content of a tight list item."""
+
+    __slots__ = ("children",)
+    children: Tuple[Inline, ...]
+
+
+@dataclass(frozen=True)
+class CodeBlock:
+    """A fenced or indented code block."""
+
+    __slots__ = ("code", "info")
+    code: str
+    info: str
+
+
+@dataclass(frozen=True)
+class Quote:
+    """A blockquote, possibly a GitHub-style callout."""
+
+    __slots__ = ("children",)
+    children: Tuple["Block", ...]
+
+
+@dataclass(frozen=True)
+class ListItem:
+    """A single list item."""
+
+    __slots__ = ("children",)
+    children: Tuple["Block", ...]
+
+
+@dataclass(frozen=True)
+class ListBlock:
+    """An ordered or unordered list."""
+
+    __slots__ = ("ordered", "start", "items")
+    ordered: bool
+    start: int
+    items: Tuple[ListItem, ...]
+
+
+@dataclass(frozen=True)
+class Table:
+    """A GFM table: per-column alignment, a header row and body rows."""
+
+    __slots__ = ("aligns", "header", "rows")
+    aligns: Tuple[Optional[str], ...]
+    header: Tuple[Tuple[Inline, ...], ...]
+    rows: Tuple[Tuple[Tuple[Inline, ...], ...], ...]
+
+
+@dataclass(frozen=True)
+class ThematicBreak:
+    """A horizontal rule."""
+
+    __slots__ = ()
+
+
+@dataclass(frozen=True)
+class BlankLine:
+    """One or more blank lines between blocks."""
+
+    __slots__ = ()
+
+
+@dataclass(frozen=True)
+class HtmlBlock:
+    """Raw block-level HTML, which is not displayed in the terminal."""
+
+    __slots__ = ("raw",)
+    raw: str
+
+
+Block = Union[
+    Heading,
+    Paragraph,
+    BlockText,
+    CodeBlock,
+    Quote,
+    ListBlock,
+    ListItem,
+    Table,
+    ThematicBreak,
+    BlankLine,
+    HtmlBlock,
+]
+
+_BLANK_LINE = BlankLine()
+_THEMATIC_BREAK = ThematicBreak()
+
+
+def _build_inlines(tokens: Iterable[Dict[str, Any]]) -> Tuple[Inline, ...]:
+    """Convert mistune inline tokens into ``Inline`` spans."""
+    inlines = []
+    for token in tokens:
+        kind = token["type"]
+        if kind in ("text", "codespan"):
+            inlines.append(Inline(kind, token["raw"], "", ()))
+        elif kind in ("emphasis", "strong"):
+            inlines.append(Inline(kind, "", "", _build_inlines(token["children"])))
+        elif kind in ("link", "image"):
+            inlines.append(
+                Inline(
+                    kind,
+                    "",
+                    token["attrs"]["url"],
+                    _build_inlines(token["children"]),
+                )
+            )
+        elif kind in ("linebreak", "softbreak"):
+            inlines.append(Inline(kind, "", "", ()))
+    return tuple(inlines)
+
+
+def _build_heading(token: Dict[str, Any]) -> Block:
+    return Heading(token["attrs"]["level"], _build_inlines(token["children"]))
+
+
+def _build_paragraph(token: Dict[str, Any]) -> Block:
+    return Paragraph(_build_inlines(token["children"]))
+
+
+def _build_block_text(token: Dict[str, Any]) -> Block:
+    return BlockText(_build_inlines(token["children"]))
+
+
+def _build_code_block(token: Dict[str, Any]) -> Block:
+    # Fenced code carries its info string in 'attrs', indented code has none
+    if "attrs" in token:
+        info = token["attrs"].get("info", "")
+    else:
+        info = token.get("info", "")
+    return CodeBlock(token["raw"].rstrip(), (info or "").strip())
+
+
+def _build_quote(token: Dict[str, Any]) -> Block:
+    return Quote(build_blocks(token["children"]))
+
+
+def _build_list(token: Dict[str, Any]) -> Block:
+    attrs = token["attrs"]
+    items = tuple(
+        ListItem(build_blocks(item["children"])) for item in token["children"]
+    )
+    return ListBlock(bool(attrs.get("ordered", False)), attrs.get("start", 1), items)
+
+
+def _build_table(token: Dict[str, Any]) -> Block:
+    head: Dict[str, Any] = {"children": []}
+    body: List[Dict[str, Any]] = []
+    for part in token["children"]:
+        if part["type"] == "table_head":
+            head = part
+        elif part["type"] == "table_body":
+            body = part["children"]
+    aligns = tuple(cell["attrs"].get("align") for cell in head["children"])
+    header = tuple(_build_inlines(cell["children"]) for cell in head["children"])
+    rows = tuple(
+        tuple(_build_inlines(cell["children"]) for cell in row["children"])
+        for row in body
+    )
+    return Table(aligns, header, rows)
+
+
+def _build_thematic_break(token: Dict[str, Any]) -> Block:
+    return _THEMATIC_BREAK
+
+
+def _build_blank_line(token: Dict[str, Any]) -> Block:
+    return _BLANK_LINE
+
+
+def _build_html(token: Dict[str, Any]) -> Block:
+    return HtmlBlock(token.get("raw", ""))
+
+
+_BLOCK_BUILDERS: Dict[str, Callable[[Dict[str, Any]], Block]] = {
+    "heading": _build_heading,
+    "paragraph": _build_paragraph,
+    "block_text": _build_block_text,
+    "block_code": _build_code_block,
+    "block_quote": _build_quote,
+    "list": _build_list,
+    "table": _build_table,
+    "thematic_break": _build_thematic_break,
+    "blank_line": _build_blank_line,
+    "block_html": _build_html,
+}
+
+
+def build_blocks(tokens: Iterable[Dict[str, Any]]) -> Tuple[Block, ...]:
+    """Convert a mistune token stream into a tuple of immutable blocks."""
+    blocks = []
+    for token in tokens:
+        builder = _BLOCK_BUILDERS.get(token["type"])
+        if builder is not None:
+            blocks.append(builder(token))
+    return tuple(blocks)
+
+
+_PARSER = mistune.create_markdown(renderer=None, plugins=["table"])
+
+
+# Link reference definitions by normalized label, as mistune keeps them
+References = Dict[str, Dict[str, Any]]
+
+
+def parse_blocks(
+    markdown_text: str, references: Optional[References] = None
+) -> Tuple[Block, ...]:
+    """Parse markdown text into the block model using a shared parser.
+
+    ``references`` holds link reference definitions from earlier text that
+    links in this text may use.  Definitions found in the text are added
+    to it; an earlier definition of the same label wins.
+    """
+    if references is None:
+        tokens = _PARSER(markdown_text)
+    else:
+        state = _PARSER.block.state_cls()
+        state.env["ref_links"] = references
+        tokens, _ = _PARSER.parse(markdown_text, state)
+    # Type assertion since we know renderer=None returns tokens
+    assert isinstance(tokens, list)
+    return build_blocks(tokens)
+
+
+# Guards changes to the module-level caches below, which are shared by
+# renders on every thread; lookups are single dictionary operations
+_CACHE_LOCK = threading.Lock()
+
+
+def _cache_put(cache: Dict[Any, Any], key: Any, value: Any, limit: int) -> None:
+    """Store a value in a shared cache, evicting the oldest entry if it is full."""
+    with _CACHE_LOCK:
+        if key not in cache and len(cache) >= limit:
+            del cache[next(iter(cache))]
+        cache[key] = value
+
+
+# Lexers resolved from fence info strings, including None for names Pygments
+# does not know (a miss scans every installed plugin, which takes milliseconds)
+_LEXER_CACHE: Dict[Tuple[str, int], Optional[Lexer]] = {}
+_LEXER_CACHE_LIMIT = 256
+
+
+def _resolve_lexer(name: str, tab_size: int = 4) -> Optional[Lexer]:
+    """Return the Pygments lexer for a language name, or None if unknown."""
+    key = (name, tab_size)
+    try:
+        return _LEXER_CACHE[key]
+    except KeyError:
+        pass
+    try:
+        # The same options Rich's Syntax uses when given a name
+        lexer = get_lexer_by_name(name, stripnl=False, ensurenl=True, tabsize=tab_size)
+    except ClassNotFound:
+        lexer = None
+    _cache_put(_LEXER_CACHE, key, lexer, _LEXER_CACHE_LIMIT)
+    return lexer
+
+
+# Cheap content checks for fences without a language, tried in order against
+# the first line with text; only decisive, common cases are recognized
+_LANGUAGE_HINTS: Tuple[Tuple["re.Pattern[str]", str], ...] = tuple(
+    (re.compile(pattern), language)
+    for pattern, language in (
+        (r"^#!.*\bpython", "python"),
+        (r"^#!.*\b(?:ba|z)?sh\b", "bash"),
+        (r"^#!.*\bnode\b", "javascript"),
+        (r"^<\?php", "php"),
+        (r"^<(?:!DOCTYPE html|html)\b", "html"),
+        (r"^<\?xml\b", "xml"),
+        (
+            r"^(?:from \S+ import|import \w+(?:\.\w+)*$|def \w+\(|class \w+[:(])",
+            "python",
+        ),
+        (r"^(?:package \w+$|func \w+\()", "go"),
+        (r"^(?:fn \w+|use \w+::|pub (?:fn|struct|enum) )", "rust"),
+        (r"^#include\s*[<\"]", "c"),
+        (r"^(?:const|let|var) \w+ = |^function \w+\(", "javascript"),
+        (r"^(?:SELECT|INSERT|UPDATE|DELETE|CREATE TABLE)\b", "sql"),
+        (r"^\$ \S", "console"),
+        (r"^diff --git |^--- \S", "diff"),
+    )
+)
+
+
+# An object or array whose first member looks like JSON
+_JSON_START_RE = re.compile(r'\s*[{\[]\s*(?:"[^"\n]*"\s*[:,\]]|[{\[\]}]|-?\d)')
+
+
+def guess_language(code: str) -> Optional[str]:
+    """Guess the language of a code block from its first line with text.
+
+    This is a handful of anchored regular expressions rather than Pygments'
+    ``guess_lexer``, which runs every lexer's analyser over the whole code.
+    """
+    # JSON is recognized by its first tokens, which may span lines
+    if _JSON_START_RE.match(code):
+        return "json"
+    for line in code.split("\n", 8)[:8]:
+        line = line.strip()
+        if not line:
+            continue
+        for pattern, language in _LANGUAGE_HINTS:
+            if pattern.match(line):
+                return language
+        return None
+    return None
+
+
+# Highlighted code keyed by everything except the width, so a code block is
+# lexed once no matter how often it is re-laid out
+_HIGHLIGHT_CACHE: Dict[Any, Text] = {}
+_HIGHLIGHT_CACHE_LIMIT = 128
+
+
+# Highlighted complete lines of code fences still being streamed, as
+# (highlight key, code, text) entries; a frame only lexes lines added since.
+# Entries are replaced, never changed, so other threads see whole entries
+_OPEN_FENCE_HIGHLIGHTS: List[Tuple[Any, str, Text]] = []
+_OPEN_FENCE_HIGHLIGHTS_LIMIT = 8
+
+
+class _CachedSyntax(Syntax):
+    """``Syntax`` that reuses highlighted text across frames and widths.
+
+    With ``incremental=True`` (for a code fence that is still open while
+    streaming), the code is assumed to only grow: lines highlighted for an
+    earlier frame are reused and only new lines are lexed, each batch from a
+    fresh lexer state.  Constructs spanning batches (such as multi-line
+    strings) may be highlighted inexactly until the fence is closed and the
+    block is highlighted in full.
+    """
+
+    def __init__(
+        self,
+        code: str,
+        lexer: Union[Lexer, str],
+        *,
+        theme: str,
+        incremental: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(code, lexer, theme=theme, **kwargs)
+        self.incremental = incremental
+        self._highlight_key = (
+            lexer,
+            theme,
+            self.background_color,
+            self.tab_size,
+            self.word_wrap,
+        )
+
+    def highlight(
+        self,
+        code: str,
+        line_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    ) -> Text:
+        if self._stylized_ranges:
+            return super().highlight(code, line_range)
+        if self.incremental and line_range is None:
+            return self._highlight_incrementally(code)
+        key = (self._highlight_key, line_range, code)
+        text = _HIGHLIGHT_CACHE.get(key)
+        if text is None:
+            text = super().highlight(code, line_range)
+            _cache_put(_HIGHLIGHT_CACHE, key, text, _HIGHLIGHT_CACHE_LIMIT)
+        # Rendering trims the copy it is given, so never hand out the original
+        return text.copy()
+
+    def _highlight_incrementally(self, code: str) -> Text:
+        """Highlight growing code, lexing only lines added since the last call."""
+        # The last line may still be incomplete, so it is never kept
+        last_line = code.rfind("\n", 0, len(code) - 1) + 1
+        complete, partial = code[:last_line], code[last_line:]
+        if not complete:
+            return super().highlight(code)
+
+        entry: Optional[Tuple[Any, str, Text]] = None
+        for candidate in tuple(_OPEN_FENCE_HIGHLIGHTS):
+            if candidate[0] == self._highlight_key and complete.startswith(
+                candidate[1]
+            ):
+                if entry is None or len(candidate[1]) > len(entry[1]):
+                    entry = candidate
+
+        if entry is None or len(complete) > len(entry[1]):
+            text = entry[2].copy() if entry is not None else Text()
+            lexed = len(entry[1]) if entry is not None else 0
+            text.append_text(super().highlight(complete[lexed:]))
+            extended = (self._highlight_key, complete, text)
+            with _CACHE_LOCK:
+                # The entry grown keeps its place; a new one evicts the oldest
+                entries = _OPEN_FENCE_HIGHLIGHTS
+                index = next((i for i, e in enumerate(entries) if e is entry), None)
+                if index is not None:
+                    entries[index] = extended
+                else:
+                    if len(entries) >= _OPEN_FENCE_HIGHLIGHTS_LIMIT:
+                        entries.pop(0)
+                    entries.append(extended)
+            entry = extended
+
+        # Wrapping, justification and base style as a full highlight has them
+        highlighted = super().highlight(partial)
+        text = highlighted.blank_copy()
+        text.append_text(entry[2])
+        text.append_text(highlighted)
+        return text
+
+    @property
+    def lexer(self) -> Optional[Lexer]:
+        """The lexer for this syntax, resolved through the shared cache."""
+        if isinstance(self._lexer, str):
+            return _resolve_lexer(self._lexer, self.tab_size)
+        return self._lexer
+
+
+_NULL_STYLE = Style.null()
+
+# Style definitions used by the default theme; custom themes override these
+DEFAULT_STYLES: Dict[str, str] = {
+    "heading.1": "bold bright_cyan",
+    "heading.1.rule": "bright_cyan",
+    "heading.2": "bold bright_blue",
+    "heading.2.rule": "blue",
+    "heading.3": "bold bright_magenta",
+    "heading.4": "bold bright_yellow",
+    "heading.5": "bold bright_green",
+    "heading.6": "bold bright_white",
+    "emphasis": "italic",
+    "strong": "bold",
+    "codespan": "bold red on black",
+    "link": "bold blue underline",
+    "link.url": "dim blue",
+    "image": "bold magenta",
+    "image.url": "dim magenta",
+    "code.border": "dim",
+    "code.plain": "dim white on black",
+    "quote.border": "dim blue",
+    "quote.text": "italic dim blue",
+    "list.bullet": "bold yellow",
+    "list.number": "bold cyan",
+    "table.header": "bold",
+    "table.border": "dim",
+    "rule": "dim",
+    "callout.note": "blue",
+    "callout.note.title": "bold blue",
+    "callout.tip": "green",
+    "callout.tip.title": "bold green",
+    "callout.warning": "yellow",
+    "callout.warning.title": "bold yellow",
+    "callout.important": "magenta",
+    "callout.important.title": "bold magenta",
+    "callout.caution": "red",
+    "callout.caution.title": "bold red",
+}
+
+# Emoji and default title of each GitHub-style callout type
+DEFAULT_CALLOUTS: Dict[str, Tuple[str, str]] = {
+    "note": ("📝", "Note"),
+    "tip": ("💡", "Tip"),
+    "warning": ("⚠️", "Warning"),
+    "important": ("❗", "Important"),
+    "caution": ("🚨", "Caution"),
+}
+
+
+# Cell widths of characters and of strings that contain wide or zero-width
+# characters.  Rich caches the last 4096 of each, which a CJK document or a
+# long stream of output lines cycles through completely; characters are
+# finite, so they are cached for good.
+_CHAR_WIDTHS: Dict[str, int] = {}
+_TEXT_WIDTHS: Dict[str, int] = {}
+_TEXT_WIDTHS_LIMIT = 16384
+
+
+def _cell_width(text: str) -> int:
+    """Return the number of terminal cells text occupies, like ``cell_len``."""
+    if _is_single_cell_widths(text):
+        return len(text)
+    width = _TEXT_WIDTHS.get(text)
+    if width is None:
+        char_widths = _CHAR_WIDTHS
+        width = 0
+        for char in text:
+            char_width = char_widths.get(char)
+            if char_width is None:
+                char_width = char_widths[char] = get_character_cell_size(char)
+            width += char_width
+        _cache_put(_TEXT_WIDTHS, text, width, _TEXT_WIDTHS_LIMIT)
+    return width
+
+
+class CalloutStyle:
+    """Emoji, title and pre-parsed styles of one callout type."""
+
+    __slots__ = ("emoji", "title", "border_style", "title_style", "title_text")
+
+    def __init__(
+        self, emoji: str, title: str, border_style: Style, title_style: Style
+    ) -> None:
+        self.emoji = emoji
+        self.title = title
+        self.border_style = border_style
+        self.title_style = title_style
+        # The title line with emoji and two extra spaces
+        self.title_text = Text(f"{emoji}  {title}", style=title_style)
+
+    def title_line(self, custom_title: Optional[str] = None) -> Text:
+        """Return the title line, using a custom title if one is given."""
+        if not custom_title:
+            return self.title_text
+        return Text(f"{self.emoji}  {custom_title}", style=self.title_style)
+
+
+class MarkdownTheme:
+    """Pre-parsed styles and prebuilt renderables shared by every render.
+
+    Style definitions are parsed into ``Style`` objects once, when the theme
+    is built, so rendering never re-parses style strings.  A theme is
+    immutable after construction and can be shared between renderers.
+    """
+
+    def __init__(
+        self,
+        styles: Optional[Dict[str, str]] = None,
+        callouts: Optional[Dict[str, Dict[str, str]]] = None,
+        syntax_theme: str = "ansi_dark",
+        guess_language: bool = False,
+    ) -> None:
+        definitions = dict(DEFAULT_STYLES)
+        definitions.update(styles or {})
+        self.styles = {
+            name: Style.parse(definition) for name, definition in definitions.items()
+        }
+        self.syntax_theme = syntax_theme
+        # Guess the language of code fences that do not name one
+        self.guess_language = guess_language
+
+        self.headings = tuple(self.styles[f"heading.{level}"] for level in range(1, 7))
+        self.h1_rule = Rule(style=self.styles["heading.1.rule"])
+        self.h2_rule = Rule(style=self.styles["heading.2.rule"])
+        self.thematic_break = Rule(style=self.styles["rule"])
+        # Unordered list markers and their measured width
+        self.bullet = Text("•", style=self.styles["list.bullet"])
+        self.bullet_width = _cell_width(self.bullet.plain)
+
+        self.quote_border = Text("│", style=self.styles["quote.border"])
+
+        callout_text = {
+            name: {"emoji": emoji, "title": title}
+            for name, (emoji, title) in DEFAULT_CALLOUTS.items()
+        }
+        for name, overrides in (callouts or {}).items():
+            callout_text.setdefault(name, {"emoji": "", "title": name.title()})
+            callout_text[name].update(overrides)
+        self.callouts = {
+            name: CalloutStyle(
+                text["emoji"],
+                text["title"],
+                self.styles.get(f"callout.{name}", self.styles["callout.note"]),
+                self.styles.get(
+                    f"callout.{name}.title", self.styles["callout.note.title"]
+                ),
+            )
+            for name, text in callout_text.items()
+        }
+
+    @classmethod
+    def load(cls, path: str, **overrides: Any) -> "MarkdownTheme":
+        """Load a theme from a JSON file.
+
+        The file may contain ``styles`` (style name to Rich style definition),
+        ``callouts`` (callout type to ``emoji`` and ``title``),
+        ``syntax_theme`` (a Pygments style name for code blocks) and
+        ``guess_language`` (whether to guess the language of unlabeled code).
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        settings = {
+            "styles": data.get("styles"),
+            "callouts": data.get("callouts"),
+            "syntax_theme": data.get("syntax_theme", "ansi_dark"),
+            "guess_language": data.get("guess_language", False),
+        }
+        # Keyword arguments (e.g. from command line flags) win over the file
+        settings.update(overrides)
+        return cls(**settings)
+
+
+DEFAULT_THEME = MarkdownTheme()
+
+
+# Control codes that ``Text`` strips from its content
+_STRIP_CONTROL_RE = re.compile(
+    "[" + "".join(re.escape(chr(code)) for code in STRIP_CONTROL_CODES) + "]"
+)
+
+
+def _inline_text(parts: List[str], spans: List[Span]) -> Text:
+    """Join inline text parts into a ``Text``, stripping control codes."""
+    plain = "".join(parts)
+    if _STRIP_CONTROL_RE.search(plain):
+        # Spans always start and end on part boundaries, so map each old
+        # boundary to its offset in the stripped text
+        offsets = {0: 0}
+        old = new = 0
+        for i, part in enumerate(parts):
+            old += len(part)
+            parts[i] = strip_control_codes(part)
+            new += len(parts[i])
+            offsets[old] = new
+        plain = "".join(parts)
+        spans = [
+            Span(offsets[span.start], offsets[span.end], span.style)
+            for span in spans
+            if offsets[span.start] < offsets[span.end]
+        ]
+    return Text(plain, spans=spans)
+
+
+class _TableLayout:
+    """Rendered cells and natural column widths of a table, grown row by row.
+
+    A layout is never changed once cached: growing it returns a new layout
+    sharing the rendered cells, so renders on other threads are unaffected.
+    """
+
+    __slots__ = ("rows", "cells", "widths")
+
+    def __init__(
+        self,
+        rows: Tuple[Tuple[Tuple[Inline, ...], ...], ...],
+        cells: List[List[Text]],
+        widths: List[int],
+    ) -> None:
+        self.rows = rows
+        self.cells = cells
+        self.widths = widths
+
+    @classmethod
+    def for_header(cls, header: Sequence[Text]) -> "_TableLayout":
+        """Return the layout of a table with no rows yet."""
+        return cls((), [list(header)], [_cell_width(cell.plain) for cell in header])
+
+    def extended(
+        self,
+        rows: Tuple[Tuple[Tuple[Inline, ...], ...], ...],
+        render_cell: Callable[[Sequence[Inline]], Text],
+    ) -> "_TableLayout":
+        """Return a layout for rows continuing this one's, rendering only new rows."""
+        widths = list(self.widths)
+        cells = list(self.cells)
+        columns = len(widths)
+        for row in rows[len(self.rows) :]:
+            texts = [render_cell(cell) for cell in row[:columns]]
+            texts.extend(Text() for _ in range(columns - len(texts)))
+            for i, text in enumerate(texts):
+                text_width = _cell_width(text.plain)
+                if text_width > widths[i]:
+                    widths[i] = text_width
+            cells.append(texts)
+        return _TableLayout(rows, cells, widths)
+
+
+# Layouts of recently rendered tables, keyed by header.  A streamed table is
+# re-rendered on every frame with a few more rows, so only the new rows need
+# to be rendered and measured.
+_TABLE_LAYOUTS: Dict[Any, _TableLayout] = {}
+_TABLE_LAYOUT_LIMIT = 16
+
+
+def _table_layout(
+    table: Table,
+    render_cell: Callable[[Sequence[Inline]], Text],
+    theme: Optional[MarkdownTheme] = None,
+) -> _TableLayout:
+    """Return the (possibly cached) layout of a table, extended to all its rows."""
+    # Rendered cells depend on the theme's inline styles
+    key = (theme, table.aligns, table.header)
+    layout = _TABLE_LAYOUTS.get(key)
+    if layout is None or table.rows[: len(layout.rows)] != layout.rows:
+        layout = _TableLayout.for_header([render_cell(cell) for cell in table.header])
+    elif len(layout.rows) == len(table.rows):
+        return layout
+    layout = layout.extended(table.rows, render_cell)
+    _cache_put(_TABLE_LAYOUTS, key, layout, _TABLE_LAYOUT_LIMIT)
+    return layout
+
+
+def _fit_columns(widths: Sequence[int], available: int) -> List[int]:
+    """Shrink the widest columns until the total width fits the space available."""
+    if sum(widths) <= available:
+        return list(widths)
+    low, high = 1, max(widths)
+    while low < high:
+        cap = (low + high + 1) // 2
+        if sum(min(width, cap) for width in widths) <= available:
+            low = cap
+        else:
+            high = cap - 1
+    return [min(width, low) for width in widths]
+
+
+# Rich color system for each --color choice ("auto" detects the terminal's)
+COLOR_SYSTEMS: Dict[str, Optional[str]] = {
+    "auto": "auto",
+    "none": None,
+    "16": "standard",
+    "256": "256",
+    "truecolor": "truecolor",
+}
+
+# SGR parameters of each style, per color system.  Rich keeps a style's
+# codes for the first color system it is rendered with, so a style shared
+# between consoles with different color systems would be rendered wrongly
+_SGR_CODES: Dict[Tuple[Style, ColorSystem], str] = {}
+_SGR_CODES_LIMIT = 4096
+
+
+# SGR parameter of each style attribute, in the order Rich writes them
+_SGR_ATTRIBUTES = (
+    ("bold", "1"),
+    ("dim", "2"),
+    ("italic", "3"),
+    ("underline", "4"),
+    ("blink", "5"),
+    ("blink2", "6"),
+    ("reverse", "7"),
+    ("conceal", "8"),
+    ("strike", "9"),
+    ("underline2", "21"),
+    ("frame", "51"),
+    ("encircle", "52"),
+    ("overline", "53"),
+)
+
+
+def _sgr_codes(style: Style, color_system: ColorSystem) -> str:
+    """Return the SGR parameters for a style in a color system, cached.
+
+    The parameters are built from the style's public attributes and colors,
+    as Rich builds them, without its per-style cache.
+    """
+    key = (style, color_system)
+    codes = _SGR_CODES.get(key)
+    if codes is None:
+        sgr = [code for name, code in _SGR_ATTRIBUTES if getattr(style, name)]
+        if style.color is not None:
+            sgr.extend(style.color.downgrade(color_system).get_ansi_codes())
+        if style.bgcolor is not None:
+            sgr.extend(
+                style.bgcolor.downgrade(color_system).get_ansi_codes(foreground=False)
+            )
+        codes = ";".join(sgr)
+        _cache_put(_SGR_CODES, key, codes, _SGR_CODES_LIMIT)
+    return codes
+
+
+# Control codes erasing one line above the cursor
+_ERASE_LINE = ((ControlType.CURSOR_UP, 1), (ControlType.ERASE_IN_LINE, 2))
+
+
+class _TerminalConsole(Console):
+    """A console that converts each style to escape codes once per color system.
+
+    Without a color system, segments are written as plain text and no style
+    is converted at all.  Output to a file with a descriptor is encoded once
+    and handed to ``os.write``, skipping the text layer's own buffering.
+    """
+
+    def _output_fd(self) -> Optional[int]:
+        """Return the descriptor to write to directly, or None."""
+        if sys.platform == "win32" or self.record or self.is_jupyter:
+            return None
+        try:
+            return self.file.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def _write_buffer(self) -> None:
+        fd = self._output_fd()
+        if fd is None:
+            super()._write_buffer()
+            return
+        with self._lock:
+            if self._buffer_index:
+                return
+            text = self._render_buffer(self._buffer)
+            del self._buffer[:]
+            if not text:
+                return
+            file = self.file
+            data = text.encode(
+                getattr(file, "encoding", None) or "utf-8",
+                getattr(file, "errors", None) or "strict",
+            )
+            # Anything written to the file object itself must come first
+            file.flush()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+
+    def _render_buffer(self, buffer: Iterable[Segment]) -> str:
+        color_system = self._color_system
+        not_terminal = not self.is_terminal
+        if color_system is None:
+            return "".join(
+                text
+                for text, style, control in buffer
+                if style or not (not_terminal and control)
+            )
+
+        output: List[str] = []
+        append = output.append
+        legacy_windows = self.legacy_windows
+        if self.no_color:
+            buffer = Segment.remove_color(buffer)
+        for text, style, control in buffer:
+            if style:
+                codes = _sgr_codes(style, color_system)
+                rendered = f"\x1b[{codes}m{text}\x1b[0m" if codes and text else text
+                if style.link and not legacy_windows and text:
+                    rendered = (
+                        f"\x1b]8;id={style.link_id};{style.link}\x1b\\"
+                        f"{rendered}\x1b]8;;\x1b\\"
+                    )
+                append(rendered)
+            elif not (not_terminal and control):
+                append(text)
+        return "".join(output)
+
+
+class _LineConsole(Console):
+    """A console that keeps its output as styled lines instead of writing it.
+
+    Blocks nested in other blocks are rendered here, so their lines can be
+    placed in the outer block without a round trip through escape codes.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._segments: List[Segment] = []
+
+    def _write_buffer(self) -> None:
+        with self._lock:
+            if not self._buffer_index:
+                self._segments.extend(self._buffer)
+                del self._buffer[:]
+
+    def text_lines(self) -> List[Text]:
+        """Return the output so far as one ``Text`` per line."""
+        lines = []
+        for line in Segment.split_lines(self._segments):
+            parts: List[str] = []
+            spans: List[Span] = []
+            offset = 0
+            for text, style, control in line:
+                if control or not text:
+                    continue
+                parts.append(text)
+                if style:
+                    spans.append(Span(offset, offset + len(text), style))
+                offset += len(text)
+            lines.append(Text("".join(parts), spans=spans))
+        return lines
+
+
+def make_console(
+    width: Optional[int] = None,
+    color_system: Optional[str] = "256",
+    file: Optional[TextIO] = None,
+) -> Console:
+    """Create the console md2term renders to.
+
+    ``color_system`` is a Rich color system name (``"standard"``, ``"256"``,
+    ``"truecolor"``), ``"auto"`` to detect it from the environment, or None
+    for plain text.
+    """
+    return _TerminalConsole(
+        file=file,
+        width=width,
+        force_terminal=True,
+        color_system=color_system,  # type: ignore[arg-type]
+    )
+
+
+# First line of a GitHub-style callout: "[!NOTE]" or "[!NOTE] Custom Title"
+_CALLOUT_RE = re.compile(r"^\[!([A-Z]+)\](?:\s+(.+))?$")
+
+
 class TerminalRenderer:
     """Custom renderer for converting markdown AST to Rich terminal output."""
 
-    def __init__(self, console: Console):
+    def __init__(
+        self,
+        console: Console,
+        theme: Optional[MarkdownTheme] = None,
+        highlight: bool = True,
+        open_code: Optional[CodeBlock] = None,
+    ):
         self.console = console
+        self.theme = theme or DEFAULT_THEME
+        # Without highlighting, code is shown as plain text in the same layout;
+        # there is nothing to highlight when no colors are written
+        self.highlight = highlight and console.color_system is not None
+        # A code block whose fence is still open, highlighted incrementally
+        self.open_code = open_code
+        # Last block rendered, for spacing across render_blocks calls
+        self._previous_block: Optional[Block] = None
         self.in_code_block = False
         self.code_block_lines: List[str] = []
         self.code_block_lang = None
 
     def render(self, tokens: List[Dict[str, Any]]) -> None:
         """Render a list of markdown tokens to the terminal."""
-        for i, token in enumerate(tokens):
-            # Only add spacing between non-blank-line elements
-            if (
-                i > 0
-                and token["type"] != "blank_line"
-                and tokens[i - 1]["type"] != "blank_line"
-            ):
-                self.console.print()
-            self._render_token(token)
-
-    def _render_token(self, token: Dict[str, Any]) -> None:
-        """Render a single markdown token."""
-        token_type = token["type"]
-
-        if token_type == "heading":
-            self._render_heading(token)
-        elif token_type == "paragraph":
-            self._render_paragraph(token)
-        elif token_type == "block_text":
-            self._render_block_text(token)
-        elif token_type == "block_code":
-            self._render_code_block(token)
-        elif token_type == "block_quote":
-            self._render_blockquote(token)
-        elif token_type == "list":
-            self._render_list(token)
-        elif token_type == "thematic_break":
-            self._render_thematic_break()
-        elif token_type == "blank_line":
-            self.console.print()
-
-    def _render_heading(self, token: Dict[str, Any]) -> None:
+        self.render_blocks(build_blocks(tokens))
+
+    def render_blocks(self, blocks: Sequence[Block]) -> None:
+        """Render a sequence of blocks to the terminal.
+
+        Consecutive calls continue the same document, so blocks can be
+        rendered as they arrive with the same spacing as in one call.
+        """
+        previous = self._previous_block
+        # Segments are collected for all blocks and written once at the end
+        with self.console:
+            for block in blocks:
+                # Only add spacing between non-blank-line elements
+                if (
+                    previous is not None
+                    and not isinstance(block, BlankLine)
+                    and not isinstance(previous, BlankLine)
+                ):
+                    self.console.print()
+                self._render_block(block)
+                previous = block
+        self._previous_block = previous
+
+    def _render_block(self, block: Block) -> None:
+        """Render a single block through the type-keyed dispatch table."""
+        self._BLOCK_HANDLERS[type(block)](self, block)
+
+    def _render_heading(self, block: Heading) -> None:
         """Render a heading with appropriate styling."""
-        level = token["attrs"]["level"]
-        text = self._render_inline_tokens(token["children"])
+        level = block.level
+        text = self._render_inline_tokens(block.children)
+
+        theme = self.theme
+        style = theme.headings[min(max(level, 1), 6) - 1]
 
-        # Different colors and styles for different heading levels
         if level == 1:
-            # Bright cyan, bold, with rule above and below
-            self.console.print(Rule(style="bright_cyan"))
-            self.console.print(text, style="bold bright_cyan", justify="center")
-            self.console.print(Rule(style="bright_cyan"))
+            # Centered, with rule above and below
+            self.console.print(theme.h1_rule)
+            self.console.print(text, style=style, justify="center")
+            self.console.print(theme.h1_rule)
         elif level == 2:
-            # Bright blue, bold, with rule below
-            self.console.print(text, style="bold bright_blue")
-            self.console.print(Rule(style="blue"))
-        elif level == 3:
-            # Bright magenta, bold
-            self.console.print(text, style="bold bright_magenta")
-        elif level == 4:
-            # Bright yellow, bold
-            self.console.print(text, style="bold bright_yellow")
-        elif level == 5:
-            # Bright green, bold
-            self.console.print(text, style="bold bright_green")
-        else:  # level 6
-            # Bright white, bold
-            self.console.print(text, style="bold bright_white")
-
-    def _render_paragraph(self, token: Dict[str, Any]) -> None:
+            # With rule below
+            self.console.print(text, style=style)
+            self.console.print(theme.h2_rule)
+        else:
+            self.console.print(text, style=style)
+
+    def _render_paragraph(self, block: Paragraph) -> None:
         """Render a paragraph with proper word wrapping."""
-        text = self._render_inline_tokens(token["children"])
+        text = self._render_inline_tokens(block.children)
         self.console.print(text)
 
-    def _render_block_text(self, token: Dict[str, Any]) -> None:
+    def _render_block_text(self, block: BlockText) -> None:
         """Render block text (used in list items and other contexts)."""
-        text = self._render_inline_tokens(token["children"])
+        text = self._render_inline_tokens(block.children)
         self.console.print(text, end="")
 
-    def _render_code_block(self, token: Dict[str, Any]) -> None:
+    def _render_code_block(self, block: CodeBlock) -> None:
         """Render a code block with syntax highlighting."""
-        code = token["raw"].rstrip()
-        # Handle different token structures - some have 'attrs', others have 'info' directly
-        if "attrs" in token:
-            lang = token["attrs"].get("info", "").strip() or "text"
-        else:
-            lang = token.get("info", "").strip() or "text"
+        code = block.code
+        lang = block.info
+        if not lang and self.theme.guess_language:
+            lang = guess_language(code) or ""
+        lang = lang or "text"
+
+        if not self.highlight:
+            # Same layout as the highlighted panel: tabs expanded, lines cropped
+            plain = Text(code.expandtabs(4), no_wrap=True, overflow="crop")
+            panel = Panel(
+                plain, border_style=self.theme.styles["code.border"], padding=(0, 1)
+            )
+            self.console.print(panel)
+            return
 
         try:
             # Use Rich's syntax highlighting with a simpler theme for consistency
-            syntax = Syntax(
+            syntax = _CachedSyntax(
                 code,
                 lang,
-                theme="ansi_dark",
+                theme=self.theme.syntax_theme,
+                incremental=block is self.open_code,
                 line_numbers=False,
                 background_color="default",
             )
-            panel = Panel(syntax, border_style="dim", padding=(0, 1))
+            panel = Panel(
+                syntax, border_style=self.theme.styles["code.border"], padding=(0, 1)
+            )
             self.console.print(panel)
         except Exception:
             # Fallback to simple code formatting if syntax highlighting fails
             panel = Panel(
-                code, border_style="dim", style="dim white on black", padding=(0, 1)
+                code,
+                border_style=self.theme.styles["code.border"],
+                style=self.theme.styles["code.plain"],
+                padding=(0, 1),
             )
             self.console.print(panel)
 
-    def _render_blockquote(self, token: Dict[str, Any]) -> None:
+    def _render_blockquote(self, block: Quote) -> None:
         """Render a blockquote with indentation and styling, including GitHub-style callouts."""
-        # Render children into a string buffer
-        old_console = self.console
-        buffer = StringIO()
-        temp_console = Console(
-            file=buffer,
-            width=self.console.size.width - 4,
+        # Check if this is a GitHub-style callout
+        callout = self._split_callout(block)
+        if callout is not None:
+            self._render_callout(*callout)
+            return
+
+        # Create GitHub-style blockquote with left border only
+        lines = self._render_lines(
+            block.children, self.console.size.width - 4, spaced=False
+        )
+        border = self.theme.quote_border
+        rows = []
+        for line in lines:
+            if line.plain.strip():  # Only add border to non-empty lines
+                # The quote style lies beneath the content's own styles
+                line.style = self.theme.styles["quote.text"]
+                rows.append(Text.assemble(border, " ", line))
+            else:
+                rows.append(border)
+        if rows:
+            self.console.print(Text("\n").join(rows), no_wrap=True)
+
+    def _split_callout(
+        self, block: Quote
+    ) -> Optional[Tuple[str, Optional[str], Tuple[Block, ...]]]:
+        """Detect a GitHub-style callout in a blockquote.
+
+        A callout's first line is ``[!TYPE]``, optionally followed by a
+        custom title.  Returns the lowercased type, the custom title and
+        the blocks of the callout's content, or None for a plain quote.
+        """
+        if not block.children or not isinstance(block.children[0], Paragraph):
+            return None
+        inlines = block.children[0].children
+        first_break = next(
+            (
+                i
+                for i, inline in enumerate(inlines)
+                if inline.kind in ("softbreak", "linebreak")
+            ),
+            len(inlines),
+        )
+        first_line = self._render_inline_tokens(inlines[:first_break]).plain.strip()
+
+        # Match patterns like "[!NOTE]" or "[!NOTE] Custom Title"
+        match = _CALLOUT_RE.match(first_line)
+        if match is None:
+            return None
+
+        # The content is the rest of the paragraph and the blocks after it
+        rest = inlines[first_break + 1 :]
+        content = ((Paragraph(rest),) if rest else ()) + block.children[1:]
+        start, end = 0, len(content)
+        while start < end and isinstance(content[start], BlankLine):
+            start += 1
+        while end > start and isinstance(content[end - 1], BlankLine):
+            end -= 1
+        return match.group(1).lower(), match.group(2), content[start:end]
+
+    def _render_callout(
+        self, callout_type: str, custom_title: Optional[str], content: Sequence[Block]
+    ) -> None:
+        """Render a GitHub-style callout with emoji and appropriate styling."""
+        # Unknown callout types fall back to the note style
+        style = self.theme.callouts.get(callout_type, self.theme.callouts["note"])
+        title_line = style.title_line(custom_title)
+
+        # Render the callout as a panel, with title and content separated
+        panel_content = title_line
+        lines = self._render_lines(content, self.console.size.width - 6)
+        if lines:
+            panel_content = Text.assemble(title_line, "\n\n", Text("\n").join(lines))
+
+        # Create and display the panel
+        panel = Panel(
+            panel_content,
+            border_style=style.border_style,
+            padding=(0, 1),
+            expand=False,
+        )
+        self.console.print(panel)
+
+    def _render_list(self, block: ListBlock, indent_level: int = 0) -> None:
+        """Render ordered or unordered lists, nested lists included, in one print.
+
+        Items are laid out in a single pass with an explicit stack of nested
+        lists.  Each item's content is wrapped to the space after its marker,
+        with continuation lines indented to match, and every line of the list
+        is joined into one ``Text``.
+        """
+        styles = self.theme.styles
+        width = self.console.size.width
+        lines: List[Text] = []
+        # Each entry: a list, its nesting level and its remaining items
+        stack = [(block, indent_level, iter(enumerate(block.items)))]
+
+        while stack:
+            current, level, items = stack[-1]
+            entry = next(items, None)
+            if entry is None:
+                stack.pop()
+                continue
+            i, item = entry
+
+            prefix = Text("  " * level)  # 2 spaces per level
+            if current.ordered:
+                number = f"{current.start + i}."
+                prefix.append(number, style=styles["list.number"])
+                marker_width = len(number)
+            else:
+                prefix.append_text(self.theme.bullet)
+                marker_width = self.theme.bullet_width
+            prefix.append(" ")
+            hanging = " " * (2 * level + marker_width + 1)
+            content_width = max(1, width - len(hanging))
+
+            item_lines: List[Text] = []
+            nested_lists = []
+            for child in item.children:
+                if isinstance(child, (Paragraph, BlockText)):
+                    text = self._render_inline_tokens(child.children)
+                    item_lines.extend(text.wrap(self.console, content_width))
+                elif isinstance(child, ListBlock):
+                    # Nested lists follow the item's own lines
+                    nested_lists.append(child)
+                else:
+                    item_lines.extend(self._render_block_lines(child, content_width))
+
+            for n, line in enumerate(item_lines):
+                lines.append((prefix if n == 0 else Text(hanging)) + line)
+            for nested_list in reversed(nested_lists):
+                stack.append(
+                    (nested_list, level + 1, iter(enumerate(nested_list.items)))
+                )
+
+        if lines:
+            self.console.print(Text("\n").join(lines), no_wrap=True)
+
+    def _render_block_lines(self, block: Block, width: int) -> List[Text]:
+        """Render a block at the given width and return its lines as ``Text``."""
+        console = self._line_console(width)
+        TerminalRenderer(console, self.theme, self.highlight)._render_block(block)
+        lines = console.text_lines()
+        while lines and not lines[-1]:
+            lines.pop()
+        return lines or [Text()]
+
+    def _render_lines(
+        self, blocks: Sequence[Block], width: int, spaced: bool = True
+    ) -> List[Text]:
+        """Render blocks at the given width and return their lines as ``Text``.
+
+        The styles of the output are kept in each line's spans, so the lines
+        can be placed inside other renderables without being parsed as
+        markup.  Trailing whitespace is removed.  Without ``spaced``, no gap
+        is added between blocks beyond their own blank lines.
+        """
+        if not blocks:
+            return []
+        console = self._line_console(width)
+        renderer = TerminalRenderer(console, self.theme, self.highlight)
+        if spaced:
+            renderer.render_blocks(blocks)
+        else:
+            for block in blocks:
+                renderer._render_block(block)
+        lines = console.text_lines()
+        while lines and not lines[-1].plain.strip():
+            lines.pop()
+        if lines:
+            lines[-1].rstrip()
+        return lines
+
+    def _line_console(self, width: int) -> "_LineConsole":
+        """Create a console collecting lines at the given width, like this one."""
+        return _LineConsole(
+            width=width,
             force_terminal=True,
-            color_system="256",
+            color_system=self.console.color_system,  # type: ignore[arg-type]
             legacy_windows=False,
         )
-        self.console = temp_console
 
-        for child in token["children"]:
-            self._render_token(child)
+    def _render_table(self, block: Table) -> None:
+        """Render a table as aligned columns in a single print."""
+        layout = _table_layout(block, self._render_inline_tokens, self.theme)
+        columns = len(layout.widths)
+        if not columns:
+            return
+        separator = " │ "
+        widths = _fit_columns(
+            layout.widths,
+            self.console.size.width - len(separator) * (columns - 1),
+        )
+        aligns = [align or "left" for align in block.aligns]
+        header_style = self.theme.styles["table.header"]
+        border_style = self.theme.styles["table.border"]
+
+        output = Text()
+        for row_index, cells in enumerate(layout.cells):
+            if row_index:
+                output.append("\n")
+            for i, cell in enumerate(cells):
+                if i:
+                    output.append(separator, style=border_style)
+                cell = cell.copy()
+                cell.truncate(widths[i], overflow="ellipsis")
+                cell.align(aligns[i], widths[i])  # type: ignore[arg-type]
+                if row_index == 0:
+                    cell.stylize(header_style)
+                output.append_text(cell)
+            if row_index == 0:
+                rule = "─┼─".join("─" * width for width in widths)
+                output.append("\n")
+                output.append(rule, style=border_style)
+
+        self.console.print(output, no_wrap=True)
+
+    def _render_thematic_break(self, block: ThematicBreak) -> None:
+        """Render a horizontal rule."""
+        self.console.print(self.theme.thematic_break)
+
+    def _render_blank_line(self, block: BlankLine) -> None:
+        """Render the gap left by blank lines between blocks."""
+        self.console.print()
+
+    def _render_html(self, block: HtmlBlock) -> None:
+        """Raw HTML has no terminal representation and is skipped."""
+
+    _BLOCK_HANDLERS: Dict[type, Callable[["TerminalRenderer", Any], None]] = {
+        Heading: _render_heading,
+        Paragraph: _render_paragraph,
+        BlockText: _render_block_text,
+        CodeBlock: _render_code_block,
+        Quote: _render_blockquote,
+        ListBlock: _render_list,
+        Table: _render_table,
+        ThematicBreak: _render_thematic_break,
+        BlankLine: _render_blank_line,
+        HtmlBlock: _render_html,
+    }
+
+    def _render_inline_tokens(self, inlines: Sequence[Inline]) -> Text:
+        """Render inline spans (emphasis, strong, code, links, etc.) into Rich Text.
+
+        The spans are walked with an explicit stack of combined styles and
+        written straight into one list of parts and one list of spans, so
+        nested markup costs no intermediate ``Text`` objects.  Outer styles
+        are combined last, so they take precedence over inner ones.
+        """
+        parts: List[str] = []
+        spans: List[Span] = []
+        position = run_start = 0
+        # Each entry: remaining children, their combined style, and text to
+        # write once they are exhausted (the URL after a link)
+        stack: List[Tuple[Iterator[Inline], Style, Optional[Tuple[str, Style]]]]
+        stack = [(iter(inlines), _NULL_STYLE, None)]
+        styles = self.theme.styles
+
+        while stack:
+            children, style, after = stack[-1]
+            inline = next(children, None)
+
+            if inline is not None:
+                kind = inline.kind
+                # Unstyled leaves extend the current run of the parent's style
+                if kind == "text":
+                    parts.append(inline.text)
+                    position += len(inline.text)
+                    continue
+                if kind == "softbreak" or kind == "linebreak":
+                    parts.append(" " if kind == "softbreak" else "\n")
+                    position += 1
+                    continue
+
+            # Everything else ends the current run
+            if position > run_start and style:
+                spans.append(Span(run_start, position, style))
+            run_start = position
+
+            if inline is None:
+                stack.pop()
+                pieces = [after] if after is not None else []
+            elif kind == "emphasis" or kind == "strong" or kind == "link":
+                url = None
+                if kind == "link":
+                    url = (f" ({inline.url})", styles["link.url"] + style)
+                stack.append((iter(inline.children), styles[kind] + style, url))
+                continue
+            elif kind == "codespan":
+                pieces = [(inline.text, styles[kind] + style)]
+            elif kind == "image":
+                alt_text = self._render_inline_tokens(inline.children).plain
+                pieces = [
+                    (f"[IMAGE: {alt_text}]", styles[kind] + style),
+                    (f" ({inline.url})", styles["image.url"] + style),
+                ]
+            else:
+                continue
+
+            # Styled leaves are runs of their own
+            for piece, piece_style in pieces:
+                if piece:
+                    parts.append(piece)
+                    position += len(piece)
+                    spans.append(Span(run_start, position, piece_style))
+                    run_start = position
+
+        return _inline_text(parts, spans)
+
+
+# Fast path for block-simple input
+#
+# Prose and log text without block syntax is split into paragraphs directly.
+# Paragraphs without inline markup are wrapped with Rich's own line breaking
+# and written as-is, skipping the markdown AST and Rich's Text and Segment
+# machinery; paragraphs with inline markup go through the normal renderer.
+# Either way the output is identical to the full pipeline.
+
+# Line starts that may open anything other than a paragraph: indentation,
+# headings, quotes, tables, fences, HTML, reference definitions, list
+# markers, thematic breaks and setext underlines
+_BLOCK_SYNTAX_RE = re.compile(
+    r"^(?:[^\S\n]|[#>|`~<\[*+\-_=:]|\d{1,9}[.)](?:[ \t]|$))", re.M
+)
+# Characters that may start inline markup or need escaping, trailing
+# whitespace (hard line breaks) and control characters Rich treats specially
+_INLINE_SYNTAX_RE = re.compile(r"[*_`\[\]<&\\]|[^\S\n]$|[\x00-\x09\x0b-\x1f\x7f]", re.M)
+
+
+def _wrap_plain(text: str, width: int) -> List[str]:
+    """Wrap unstyled text into lines exactly as ``Console.print`` would."""
+    lines = []
+    start = 0
+    for end in divide_line(text, width) + [len(text)]:
+        line = text[start:end]
+        excess = len(line) - width
+        if excess > 0:
+            # Only whitespace overhanging the width is trimmed
+            line = line[: max(len(line.rstrip()), len(line) - excess)]
+        if _cell_width(line) > width:
+            line = set_cell_size(line, width)
+        lines.append(line)
+        start = end
+    return lines
+
+
+def _is_block_simple(markdown_text: str) -> bool:
+    """Check whether markdown text can take the plain-text fast path."""
+    return (
+        divide_line is not None
+        and "\r" not in markdown_text
+        and not _BLOCK_SYNTAX_RE.search(markdown_text)
+    )
+
+
+def _write_plain(console: Console, text: str) -> None:
+    """Write unstyled text, already wrapped, through the console.
+
+    The text goes into the console's buffer as a single segment, so it is
+    written in order with everything else in the same frame.
+    """
+    console.print(Segments([Segment(text)]), end="", crop=False)
+
 
-        self.console = old_console
-        content = buffer.getvalue().rstrip()
+def _render_simple(
+    console: Console, markdown_text: str, theme: Optional[MarkdownTheme] = None
+) -> bool:
+    """Render block-simple markdown through the fast path.
 
-        # Check if this is a GitHub-style callout
-        callout_info = self._detect_callout(content)
+    Returns False, without writing anything, when the text contains block
+    syntax and needs the full pipeline.
+    """
+    if not _is_block_simple(markdown_text):
+        return False
 
-        if callout_info:
-            self._render_callout(content, callout_info)
+    width = console.size.width
+    lines = markdown_text.split("\n")
+    if markdown_text.endswith("\n"):
+        lines.pop()
+
+    output: List[str] = []
+    for has_text, group in itertools.groupby(lines, key=bool):
+        if not has_text:
+            # A run of blank lines is a single blank_line token
+            output.append("\n")
+            continue
+        paragraph = list(group)
+        source = "\n".join(paragraph)
+        if _INLINE_SYNTAX_RE.search(source):
+            if output:
+                _write_plain(console, "".join(output))
+                output = []
+            TerminalRenderer(console, theme).render_blocks(parse_blocks(source))
         else:
-            # Create GitHub-style blockquote with left border only
-            lines = content.split("\n")
-            for line in lines:
-                if line.strip():  # Only add border to non-empty lines
-                    self.console.print(f"[dim blue]│[/] [italic dim blue]{line}[/]")
-                else:
-                    self.console.print("[dim blue]│[/]")
+            # Soft line breaks inside a paragraph render as spaces
+            for line in _wrap_plain(" ".join(paragraph), width):
+                output.append(line)
+                output.append("\n")
+
+    if output:
+        _write_plain(console, "".join(output))
+    return True
+
+
+def render_markdown(
+    console: Console, markdown_text: str, theme: Optional[MarkdownTheme] = None
+) -> None:
+    """Render markdown text to a console, taking the fast path when possible."""
+    if not _render_simple(console, markdown_text, theme):
+        TerminalRenderer(console, theme).render_blocks(parse_blocks(markdown_text))
+
+
+def render_ansi(
+    markdown_text: str,
+    width: int = 80,
+    theme: Optional[MarkdownTheme] = None,
+    color_system: Optional[str] = "256",
+) -> str:
+    """Render markdown text to a string of ANSI-styled terminal output."""
+    buffer = StringIO()
+    console = make_console(width, color_system, buffer)
+    render_markdown(console, markdown_text, theme)
+    return buffer.getvalue()
+
+
+@dataclass(frozen=True)
+class AnsiRenderer:
+    """Render markdown to ANSI strings, sharing one instance between threads.
+
+    An instance holds only its settings, and each ``render()`` call keeps
+    its state on a console of its own, so a service can build one renderer
+    and call it from every worker thread.  The parser, the theme's parsed
+    styles and the module's caches (lexers, highlighted code, table
+    layouts, cell widths and style codes) are shared by all threads: cache
+    updates are made under a lock, and cached values are replaced rather
+    than changed, so a render never sees another thread's half-done update.
+    """
 
-    def _detect_callout(self, content: str) -> Optional[Dict[str, str]]:
-        """Detect GitHub-style callouts in blockquote content."""
-        lines = content.strip().split("\n")
-        if not lines:
-            return None
+    width: int = 80
+    theme: MarkdownTheme = DEFAULT_THEME
+    color_system: Optional[str] = "256"
 
-        first_line = lines[0].strip()
+    def render(self, markdown_text: str) -> str:
+        """Render markdown text to a string of ANSI-styled terminal output."""
+        return render_ansi(markdown_text, self.width, self.theme, self.color_system)
 
-        # Match patterns like "[!NOTE]" or "[!NOTE] Custom Title"
-        callout_pattern = r"^\[!([A-Z]+)\](?:\s+(.+))?$"
-        match = re.match(callout_pattern, first_line)
 
-        if match:
-            callout_type = match.group(1).lower()
-            custom_title = match.group(2)
+# Opening or closing line of a fenced code block
+_FENCE_RE = re.compile(r" {0,3}(`{3,}|~{3,})(.*)")
 
-            # Get the content after the callout declaration
-            content_lines = lines[1:] if len(lines) > 1 else []
-            callout_content = "\n".join(content_lines).strip()
 
-            return {
-                "type": callout_type,
-                "title": custom_title,
-                "content": callout_content,
-            }
+class _StreamBuffer:
+    """Append-only text buffer for streaming input.
 
-        return None
+    Chunks are kept in a list and only joined when the whole text is needed,
+    while the last line with text and the start of the open block (after
+    the last blank line outside a code fence) are tracked as text arrives.
+    Each append therefore costs time proportional to the chunk (plus the
+    line it completes), not to the whole buffer.
+    """
+
+    __slots__ = (
+        "chunks",
+        "length",
+        "tail",
+        "last_text_line",
+        "block_start",
+        "_line_parts",
+        "_line_start",
+        "_fence",
+    )
+
+    def __init__(self, text: str = "") -> None:
+        self.chunks: List[str] = []
+        self.length = 0
+        # The last two characters, for cheap suffix checks
+        self.tail = ""
+        # Stripped text of the last complete line that is not blank
+        self.last_text_line = ""
+        # Offset where the block still being written starts
+        self.block_start = 0
+        self._line_parts: List[str] = []
+        self._line_start = 0
+        self._fence: Optional[str] = None
+        if text:
+            self.append(text)
+
+    def append(self, text: str) -> None:
+        """Add text to the end of the buffer."""
+        if not text:
+            return
+        self.chunks.append(text)
+        self.length += len(text)
+        self.tail = (self.tail + text)[-2:]
+
+        newline = text.rfind("\n")
+        if newline < 0:
+            self._line_parts.append(text)
+            return
+        self._line_parts.append(text[:newline])
+        lines = "".join(self._line_parts).split("\n")
+        self._line_parts = [text[newline + 1 :]]
+        for line in lines:
+            self._track_line(line)
+
+    def _track_line(self, line: str) -> None:
+        """Update the tracked offsets for one complete line."""
+        end = self._line_start + len(line) + 1
+        stripped = line.strip()
+        if stripped:
+            self.last_text_line = stripped
+
+        fence = _FENCE_RE.match(line)
+        if self._fence is not None:
+            # A closing fence uses the same character, at least as many
+            # times, with nothing after it
+            if (
+                fence
+                and fence.group(1).startswith(self._fence)
+                and not fence.group(2).strip()
+            ):
+                self._fence = None
+        elif fence and not (fence.group(1)[0] == "`" and "`" in fence.group(2)):
+            self._fence = fence.group(1)
+        elif not stripped:
+            self.block_start = end
+        self._line_start = end
+
+    @property
+    def in_fence(self) -> bool:
+        """Whether the buffer ends inside a fenced code block."""
+        return self._fence is not None
+
+    def text(self) -> str:
+        """Return the whole buffer as one string."""
+        if len(self.chunks) > 1:
+            self.chunks = ["".join(self.chunks)]
+        return self.chunks[0] if self.chunks else ""
+
+    def text_from(self, offset: int) -> str:
+        """Return the buffer from an offset, joining only the chunks needed."""
+        parts = []
+        position = self.length
+        for chunk in reversed(self.chunks):
+            if position <= offset:
+                break
+            position -= len(chunk)
+            parts.append(chunk[max(0, offset - position) :])
+        return "".join(reversed(parts))
+
+
+# Lines that start a block of their own: the kind of block they start
+_BLOCK_START_RE = re.compile(
+    r" {0,3}(?:"
+    r"(?P<heading>#{1,6}(?:[ \t]|$))"
+    r"|(?P<rule>(?:[-*_][ \t]*){3,}$)"
+    r"|(?P<list>(?:[-+*]|\d{1,9}[.)])(?:[ \t]|$))"
+    r"|(?P<quote>>)"
+    r"|(?P<fence>`{3,}|~{3,})"
+    r")"
+)
+
+
+def _line_kind(line: str) -> Optional[str]:
+    """Return the kind of block a line starts, or None for other lines."""
+    match = _BLOCK_START_RE.match(line)
+    return match.lastgroup if match else None
+
+
+# A list item's marker line: indent, bullet or number, and delimiter
+_LIST_ITEM_RE = re.compile(r"( {0,3})(?:([-+*])|\d{1,9}([.)]))([ \t]*)")
+
+
+def _list_item(line: str) -> Optional["re.Match[str]"]:
+    """Match a line starting a list item (not a rule), or return None."""
+    return _LIST_ITEM_RE.match(line) if _line_kind(line) == "list" else None
+
+
+# Characters a rejected release check may parse, per character held, before
+# further checks wait for the held text to grow
+RELEASE_CHECK_BUDGET = 4
+
+
+# A setext heading underline made of dashes, which also reads as a rule
+_SETEXT_DASHES_RE = re.compile(r" {0,3}-+[ \t]*$")
+
+
+def _indent(line: str) -> int:
+    """Return the width of a line's leading whitespace, tabs to 4 columns."""
+    return len(line.expandtabs(4)) - len(line.expandtabs(4).lstrip())
 
-    def _render_callout(self, content: str, callout_info: Dict[str, str]) -> None:
-        """Render a GitHub-style callout with emoji and appropriate styling."""
-        callout_type = callout_info["type"]
-        custom_title = callout_info["title"]
-        callout_content = callout_info["content"]
-
-        # Define callout styles and emojis
-        callout_styles = {
-            "note": {
-                "emoji": "📝",
-                "title": "Note",
-                "border_style": "blue",
-                "title_style": "bold blue",
-                "content_style": "blue",
-            },
-            "tip": {
-                "emoji": "💡",
-                "title": "Tip",
-                "border_style": "green",
-                "title_style": "bold green",
-                "content_style": "green",
-            },
-            "warning": {
-                "emoji": "⚠️",
-                "title": "Warning",
-                "border_style": "yellow",
-                "title_style": "bold yellow",
-                "content_style": "yellow",
-            },
-            "important": {
-                "emoji": "❗",
-                "title": "Important",
-                "border_style": "magenta",
-                "title_style": "bold magenta",
-                "content_style": "magenta",
-            },
-            "caution": {
-                "emoji": "🚨",
-                "title": "Caution",
-                "border_style": "red",
-                "title_style": "bold red",
-                "content_style": "red",
-            },
-        }
 
-        # Get style info, default to note if unknown type
-        style = callout_styles.get(callout_type, callout_styles["note"])
-
-        # Use custom title if provided, otherwise use default
-        title = custom_title if custom_title else style["title"]
-
-        # Create the title line with emoji and two extra spaces
-        title_line = f"{style['emoji']}  {title}"
-
-        # Render the callout as a panel
-        if callout_content:
-            # Parse and render the content with markdown
-            old_console = self.console
-            content_buffer = StringIO()
-            temp_console = Console(
-                file=content_buffer,
-                width=self.console.size.width - 6,
-                force_terminal=True,
-                color_system="256",
-                legacy_windows=False,
+class BlockSplitter:
+    """Split streamed markdown into top-level blocks as soon as they are final.
+
+    Text is held only until the blocks it contains can no longer change.
+    Lines are classified as they arrive: a line with text after a blank
+    line, a line after a closing fence, and a heading, rule, fence, list
+    item or quote that does not continue the held block are candidate
+    block starts.  At the last candidate in the text fed, the held text
+    before it is parsed with and without the line; if the blocks parsed
+    without it come out the same with it, nothing later can change them
+    and they are released, so a live frame costs one check however many
+    blocks it completes.  Lines inside a
+    fenced code block are never candidates.  Loose lists, code with blank
+    lines and similar constructs stay held until the block really ends.
+
+    Candidates that plainly continue a held list (another item of the
+    same list, or a line indented into the open item) or the paragraph
+    above them (a setext underline, or a list item that cannot interrupt
+    it) are turned down without parsing.  Other turned-down candidates cost a parse of the held
+    text, so once those parses add up to ``RELEASE_CHECK_BUDGET`` times
+    the held text, candidates are skipped until it has grown enough to
+    pay for another check; the work stays linear in the text received.
+    """
+
+    def __init__(self, held_limit: Optional[int] = None) -> None:
+        self.held_limit = held_limit
+        self._lines: List[str] = []
+        self._partial: List[str] = []
+        self._after_blank = False
+        # Link reference definitions in the released text, which the held
+        # text may still use
+        self.references: References = {}
+        # Kind of the first held line, and the open fence's marker and line
+        self._held_kind: Optional[str] = None
+        self._fence: Optional[str] = None
+        self._fence_line = ""
+        self._after_fence = False
+        # Whether the last line was text that a paragraph may go on with
+        self._after_text = False
+        # Marker (bullet or delimiter) and content column of the open item
+        # of a held list
+        self._list: Optional[Tuple[str, int]] = None
+        # Characters held, and characters parsed by rejected checks of them
+        self._held_length = 0
+        self._checked = 0
+
+    @property
+    def held(self) -> str:
+        """The text received but not yet released as blocks."""
+        return "".join(self._lines) + "".join(self._partial)
+
+    def feed(self, text: str) -> Tuple[Block, ...]:
+        """Add text and return the blocks completed by it."""
+        return tuple(block for _, blocks in self.feed_pieces(text) for block in blocks)
+
+    def feed_pieces(self, text: str) -> List[Tuple[str, Tuple[Block, ...]]]:
+        """Add text and return each piece of text released, with its blocks."""
+        newline = text.rfind("\n")
+        if newline < 0:
+            self._partial.append(text)
+            return []
+        self._partial.append(text[: newline + 1])
+        lines = "".join(self._partial).splitlines(keepends=True)
+        self._partial = [text[newline + 1 :]] if newline + 1 < len(text) else []
+
+        completed: List[Tuple[str, Tuple[Block, ...]]] = []
+        # Index of the last candidate block start among the held lines, and
+        # of the last line that may start a block at all
+        candidate: Optional[int] = None
+        boundary: Optional[int] = None
+        for line in lines:
+            blank = not line.strip()
+            if self._fence is not None:
+                # Code cannot end a block; only the closing fence can
+                fence = _FENCE_RE.match(line)
+                if (
+                    fence
+                    and fence.group(1).startswith(self._fence)
+                    and not fence.group(2).strip()
+                ):
+                    self._fence = None
+                    self._after_fence = True
+                elif self._over_limit():
+                    completed.append(self._split_fence())
+                    candidate = boundary = None
+                self._after_text = False
+                self._hold(line)
+                continue
+
+            kind = None if blank else _line_kind(line)
+            in_paragraph = self._continues_paragraph(line, kind)
+            if (
+                self._lines
+                and not blank
+                and (self._after_blank or self._after_fence or kind is not None)
+            ):
+                boundary = len(self._lines)
+                if (
+                    (self._after_blank or self._after_fence)
+                    or (kind is not None and self._starts_block(kind))
+                ) and not (self._continues_list(line) or in_paragraph):
+                    candidate = len(self._lines)
+            if not self._lines:
+                self._held_kind = kind
+            if kind == "fence":
+                fence = _FENCE_RE.match(line)
+                assert fence is not None
+                if not (fence.group(1)[0] == "`" and "`" in fence.group(2)):
+                    self._fence = fence.group(1)
+                    self._fence_line = line
+            if not blank:
+                self._track_list(line, not self._lines, self._after_blank)
+            self._hold(line)
+            self._after_blank = blank
+            self._after_fence = False
+            # An underline ends the paragraph it is under
+            self._after_text = not blank and (
+                kind is None or (in_paragraph and kind == "list")
             )
-            self.console = temp_console
 
-            # Parse the content as markdown
-            import mistune
+        # Only the last candidate is checked: if the text before it is
+        # final, so is the text before any earlier one
+        piece = None
+        if (
+            candidate is not None
+            and self._checked <= RELEASE_CHECK_BUDGET * self._held_length
+        ):
+            piece = self._release(candidate)
+        if piece is None and boundary is not None and self._over_limit():
+            # Past the limit, the held text is released at the last line
+            # that may start a block, even if that line continues it
+            piece = self._release(boundary, check=False)
+        if piece is not None:
+            completed.append(piece)
+        return completed
+
+    def _over_limit(self) -> bool:
+        """Whether more text is held than the limit allows."""
+        return self.held_limit is not None and self._held_length >= self.held_limit
+
+    def _hold(self, line: str) -> None:
+        """Add a line to the held text."""
+        self._lines.append(line)
+        self._held_length += len(line)
+
+    def _starts_block(self, kind: str) -> bool:
+        """Whether a line of this kind may start a block after the held text."""
+        # More items or quoted lines usually continue the held list or quote
+        return kind not in ("list", "quote") or kind != self._held_kind
+
+    def _continues_list(self, line: str) -> bool:
+        """Whether a line surely continues the list the held text starts with."""
+        if self._list is None:
+            return False
+        marker, column = self._list
+        if _indent(line) >= column:
+            return True
+        item = _list_item(line)
+        return item is not None and (item.group(2) or item.group(3)) == marker
 
-            markdown = mistune.create_markdown(renderer=None)
-            try:
-                tokens = markdown(callout_content)
-                # Type assertion since we know renderer=None returns tokens
-                assert isinstance(tokens, list)
-                temp_renderer = TerminalRenderer(temp_console)
-                temp_renderer.render(tokens)
-            except Exception:
-                # Fallback to plain text if parsing fails
-                temp_console.print(callout_content)
+    def _continues_paragraph(self, line: str, kind: Optional[str]) -> bool:
+        """Whether a line right after text surely goes on with its paragraph.
 
-            self.console = old_console
-            rendered_content = content_buffer.getvalue().rstrip()
+        Dashes under text underline it as a heading, and a list item can
+        only interrupt a paragraph if it has content and, when numbered,
+        starts at 1.
+        """
+        if not self._after_text:
+            return False
+        if kind == "rule":
+            return _SETEXT_DASHES_RE.match(line) is not None
+        if kind != "list":
+            return False
+        item = _list_item(line)
+        assert item is not None
+        if not line[item.end() :].strip():
+            return True
+        number = line[len(item.group(1)) : item.start(3)] if item.group(3) else "1"
+        return int(number) != 1
 
-            # Create panel with title and content properly separated
-            if rendered_content:
-                panel_content = (
-                    f"[{style['title_style']}]{title_line}[/]\n\n{rendered_content}"
+    def _track_list(self, line: str, first: bool, after_blank: bool) -> None:
+        """Follow the open item of a held list through a new line."""
+        if self._list is None and not first:
+            return
+        column = self._list[1] if self._list is not None else 4
+        indent = _indent(line)
+        if indent >= column:
+            return
+        item = _list_item(line)
+        if item is None:
+            # Text back at the list's own indent (after a blank line) ends it
+            if after_blank or self._list is None:
+                self._list = None
+            return
+        spaces = len(item.group(4).expandtabs(4))
+        # Content starts after the marker and up to four spaces
+        width = item.end(3 if item.group(3) else 2) + (
+            spaces if 0 < spaces <= 4 and line[item.end() :].strip() else 1
+        )
+        self._list = (item.group(2) or item.group(3), width)
+
+    def _release(
+        self, index: int, check: bool = True
+    ) -> Optional[Tuple[str, Tuple[Block, ...]]]:
+        """Release the held lines before a candidate if it cannot extend them.
+
+        Without ``check``, the lines are released whether or not it can.
+        """
+        held = "".join(self._lines[:index])
+        rest = self._lines[index:]
+        line = rest[0]
+        references = dict(self.references)
+        held_blocks = parse_blocks(held, references)
+        if check:
+            blocks = parse_blocks(held + line, dict(self.references))
+            # The line must start a block of its own, not be absorbed by one
+            # (a closing fence leaves the code block's content unchanged)
+            if (
+                len(blocks) <= len(held_blocks)
+                or blocks[: len(held_blocks)] != held_blocks
+            ):
+                self._checked += 2 * len(held) + len(line)
+                return None
+        self.references = references
+        self._keep(rest)
+        return held, held_blocks
+
+    def _split_fence(self) -> Tuple[str, Tuple[Block, ...]]:
+        """Release the held text up to now, closing its open code block.
+
+        The code block's opening fence is held again, so the code still to
+        come carries on in a code block of the same language.
+        """
+        assert self._fence is not None
+        opening = self._fence_line
+        indent = opening[: len(opening) - len(opening.lstrip())]
+        held = "".join(self._lines) + indent + self._fence + "\n"
+        blocks = parse_blocks(held, self.references)
+        self._keep([opening])
+        return held, blocks
+
+    def _keep(self, rest: List[str]) -> None:
+        """Hold only the lines left after a release."""
+        line = rest[0]
+        self._lines = rest
+        self._held_kind = _line_kind(line)
+        self._held_length = sum(map(len, rest))
+        self._checked = 0
+        # Follow the list the remaining lines may start
+        self._list = None
+        after_blank = False
+        for i, held_line in enumerate(rest):
+            if held_line.strip():
+                self._track_list(held_line, i == 0, after_blank)
+            after_blank = not held_line.strip()
+
+    def close(self) -> Tuple[Block, ...]:
+        """Return the blocks left at the end of the stream."""
+        held = self.held
+        self._lines = []
+        self._partial = []
+        self._after_blank = False
+        self._held_kind = None
+        self._fence = None
+        self._after_fence = False
+        self._after_text = False
+        self._list = None
+        self._held_length = 0
+        self._checked = 0
+        return parse_blocks(held, self.references) if held else ()
+
+
+# Bracketed text that may be a link label: [text][label], [label][] or [label]
+_LINK_LABEL_RE = re.compile(r"\[([^\[\]]+)\]")
+
+
+def _link_labels(text: str) -> Set[str]:
+    """Return the normalized labels that links in text may refer to."""
+    return {unikey(label) for label in _LINK_LABEL_RE.findall(text)}
+
+
+class IncrementalParser:
+    """Parse a growing markdown document without parsing all of it again.
+
+    Text is split with a BlockSplitter, so complete blocks are parsed once
+    and only the text still held is parsed for each call to ``blocks()``.
+    The splitter's link reference definitions are the index of labels
+    defined so far.  A whole document lets a link use a definition further
+    down, so a released piece that mentions a label not yet defined is
+    filed under that label (with its text), and when a definition for it
+    arrives only the pieces filed under it are parsed again.
+    """
+
+    def __init__(self) -> None:
+        # Characters fed so far
+        self.length = 0
+        self._splitter = BlockSplitter()
+        # Blocks of each released piece, and all of them in order
+        self._pieces: List[Tuple[Block, ...]] = []
+        self._released: Optional[Tuple[Block, ...]] = ()
+        # Undefined label -> pieces mentioning it, and the text of those pieces
+        self._waiting: Dict[str, List[int]] = {}
+        self._sources: Dict[int, str] = {}
+
+    def feed(self, text: str) -> None:
+        """Add text to the end of the document."""
+        self.length += len(text)
+        defined = len(self._splitter.references)
+        pieces = self._splitter.feed_pieces(text)
+        references = self._splitter.references
+        new_labels = list(itertools.islice(references, defined, None))
+        for source, blocks in pieces:
+            index = len(self._pieces)
+            self._pieces.append(blocks)
+            self._released = None
+            # Labels defined by this same text may have come too late for it
+            for label in _link_labels(source):
+                if label not in references or label in new_labels:
+                    self._waiting.setdefault(label, []).append(index)
+                    self._sources[index] = source
+        for index in self._reparse_for(new_labels):
+            self._pieces[index] = parse_blocks(self._sources[index], dict(references))
+            self._released = None
+            if _link_labels(self._sources[index]) <= references.keys():
+                del self._sources[index]
+
+    def _reparse_for(self, labels: Iterable[str]) -> Set[int]:
+        """Return the waiting pieces that mention any of the labels."""
+        pieces: Set[int] = set()
+        for label in labels:
+            pieces.update(self._waiting.pop(label, ()))
+        return pieces
+
+    def blocks(self) -> Tuple[Block, ...]:
+        """Return the blocks of the whole document fed so far."""
+        released = self._splitter.references
+        references = dict(released)
+        held = self._splitter.held
+        tail = parse_blocks(held, references) if held else ()
+        if len(references) > len(released):
+            # Definitions still held apply to the released pieces too, but
+            # may yet change, so those pieces are parsed again for each call
+            pieces = {
+                index
+                for label in itertools.islice(references, len(released), None)
+                for index in self._waiting.get(label, ())
+            }
+            if pieces:
+                return (
+                    tuple(
+                        block
+                        for index, blocks in enumerate(self._pieces)
+                        for block in (
+                            parse_blocks(self._sources[index], dict(references))
+                            if index in pieces
+                            else blocks
+                        )
+                    )
+                    + tail
                 )
-            else:
-                panel_content = f"[{style['title_style']}]{title_line}[/]"
-        else:
-            # Just the title if no content
-            panel_content = f"[{style['title_style']}]{title_line}[/]"
+        if self._released is None:
+            self._released = tuple(itertools.chain.from_iterable(self._pieces))
+        return self._released + tail
 
-        # Create and display the panel
-        panel = Panel(
-            panel_content,
-            border_style=style["border_style"],
-            padding=(0, 1),
-            expand=False,
-        )
-        self.console.print(panel)
 
-    def _render_list(self, token: Dict[str, Any], indent_level: int = 0) -> None:
-        """Render ordered or unordered lists with proper nesting support."""
-        ordered = token["attrs"].get("ordered", False)
-        start = token["attrs"].get("start", 1)
+# Seconds a streaming frame may take before live frames are degraded
+DEFAULT_FRAME_BUDGET = 0.05
 
-        # Calculate indentation for this level
-        indent = "  " * indent_level  # 2 spaces per level
+# While degraded, wait this many times the last frame's duration between frames
+FRAME_BACKOFF = 4
 
-        for i, item in enumerate(token["children"]):
-            if ordered:
-                marker = f"{start + i}."
-                marker_style = "bold cyan"
-            else:
-                marker = "•"
-                marker_style = "bold yellow"
+# Frame times kept by a renderer that splits blocks, which may run forever
+FRAME_TIMES_LIMIT = 10000
 
-            # Process the list item children
-            has_paragraph = False
-            nested_lists = []
-            paragraph_content = Text()
-
-            for child in item["children"]:
-                if child["type"] == "paragraph":
-                    has_paragraph = True
-                    # Render inline tokens for the paragraph
-                    for inline_child in child["children"]:
-                        if inline_child["type"] == "text":
-                            paragraph_content.append(inline_child["raw"])
-                        else:
-                            # Render other inline tokens
-                            inline_text = self._render_inline_tokens([inline_child])
-                            paragraph_content.append_text(inline_text)
-                elif child["type"] == "list":
-                    # Store nested lists to render after the main content
-                    nested_lists.append(child)
-                else:
-                    # Handle other block elements (shouldn't happen in well-formed markdown)
-                    if not has_paragraph:
-                        # If no paragraph, treat as direct content
-                        old_console = self.console
-                        buffer = StringIO()
-                        temp_console = Console(
-                            file=buffer,
-                            width=self.console.size.width - len(indent) - 4,
-                            force_terminal=True,
-                            color_system="256",
-                            legacy_windows=False,
-                        )
-                        self.console = temp_console
-                        self._render_token(child)
-                        self.console = old_console
-                        paragraph_content.append(buffer.getvalue().rstrip())
-
-            # Render the main list item line
-            if has_paragraph or paragraph_content.plain:
-                line_text = Text()
-                line_text.append(indent)
-                line_text.append(marker, style=marker_style)
-                line_text.append(" ")
-                line_text.append_text(paragraph_content)
-                self.console.print(line_text)
-
-            # Render any nested lists with increased indentation
-            for nested_list in nested_lists:
-                self._render_list(nested_list, indent_level + 1)
-
-    def _render_thematic_break(self) -> None:
-        """Render a horizontal rule."""
-        self.console.print(Rule(style="dim"))
-
-    def _render_inline_tokens(self, tokens: List[Dict[str, Any]]) -> Text:
-        """Render inline tokens (emphasis, strong, code, links, etc.) into Rich Text."""
-        text = Text()
-
-        for token in tokens:
-            if token["type"] == "text":
-                text.append(token["raw"])
-            elif token["type"] == "emphasis":
-                child_text = self._render_inline_tokens(token["children"])
-                child_text.stylize("italic")
-                text.append_text(child_text)
-            elif token["type"] == "strong":
-                child_text = self._render_inline_tokens(token["children"])
-                child_text.stylize("bold")
-                text.append_text(child_text)
-            elif token["type"] == "codespan":
-                text.append(token["raw"], style="bold red on black")
-            elif token["type"] == "link":
-                link_text = self._render_inline_tokens(token["children"])
-                url = token["attrs"]["url"]
-                link_text.stylize("bold blue underline")
-                text.append_text(link_text)
-                text.append(f" ({url})", style="dim blue")
-            elif token["type"] == "image":
-                alt_text = self._render_inline_tokens(token["children"]).plain
-                url = token["attrs"]["url"]
-                text.append(f"[IMAGE: {alt_text}]", style="bold magenta")
-                text.append(f" ({url})", style="dim magenta")
-            elif token["type"] == "linebreak":
-                text.append("\n")
-            elif token["type"] == "softbreak":
-                text.append(" ")
+# Characters of a large read split into blocks and written at a time
+COMMIT_PIECE_SIZE = 64 * 1024
 
-        return text
+# Characters of unfinished blocks held with split_blocks before they are
+# committed anyway, so a long loose list or code block cannot grow the
+# frame (and the work of drawing it) without bound
+HELD_TEXT_LIMIT = 16 * 1024
 
 
 class StreamingRenderer:
     """Improved streaming renderer that minimizes corruption and flickering."""
 
-    def __init__(self, console: Console):
+    def __init__(
+        self,
+        console: Console,
+        theme: Optional[MarkdownTheme] = None,
+        frame_budget: float = DEFAULT_FRAME_BUDGET,
+        split_blocks: bool = False,
+    ):
         self.console = console
-        self.buffer = ""
+        # Shared by every frame, so styles are parsed once per stream
+        self.theme = theme or DEFAULT_THEME
+        # Seconds a frame may take before live frames are degraded
+        self.frame_budget = frame_budget
+        # Once set, live frames skip syntax highlighting and are throttled;
+        # finalize() still renders with full fidelity
+        self.degraded = False
+        self._next_frame_time = 0.0
+        # Seconds taken by each live frame, for reporting; with split_blocks
+        # only the most recent ones, so memory use stays flat
+        self.frame_times: Deque[float] = deque(
+            maxlen=FRAME_TIMES_LIMIT if split_blocks else None
+        )
+        self._buffer = _StreamBuffer()
         self.last_rendered_content = ""
         self.last_rendered_lines = 0
         self.char_count = 0
         self.last_update_time = time.time()
+        # Lines currently on screen, measured only when erasing needs it
+        self._output_lines: List[str] = []
+        # Text of the last parse and its blocks (None for the fast path)
+        self._parsed_text: Optional[str] = None
+        self._parsed_blocks: Optional[Tuple[Block, ...]] = None
+        # The buffer's text parsed so far, so a frame parses only new text
+        self._document = IncrementalParser()
+        self._pending_width: Optional[int] = None
+        # With split_blocks, complete blocks are printed once, above the
+        # frame, and forgotten: the buffer only holds the text still being
+        # written, and the splitter the link references defined so far
+        self._splitter = BlockSplitter(HELD_TEXT_LIMIT) if split_blocks else None
+        self._committed = (
+            TerminalRenderer(console, self.theme) if split_blocks else None
+        )
+        # Text may be added, and the stream finished, from different threads
+        self._lock = threading.RLock()
 
     def add_text(self, text: str) -> None:
         """Add new text to the buffer and render with smart frequency control."""
-        self.buffer += text
+        with self._lock:
+            self._add_text(text)
+
+    def _add_text(self, text: str) -> None:
+        if self._pending_width is not None:
+            self._apply_resize()
         self.char_count += len(text)
         current_time = time.time()
+        if self._splitter is not None and self._commit(text):
+            self.char_count = 0
+            self.last_update_time = current_time
+            return
+        self._buffer.append(text)
 
         # Balanced update conditions for responsive streaming:
         # 1. Moderate content added (80+ chars) AND short time passed
@@ -438,63 +2180,271 @@ class StreamingRenderer:
             )
         )
 
-        if should_update:
+        # Frames that overran the budget space out the following ones
+        if should_update and current_time >= self._next_frame_time:
+            started = time.perf_counter()
             self._render_current_state()
+            elapsed = time.perf_counter() - started
+            self.frame_times.append(elapsed)
+            if elapsed > self.frame_budget:
+                self.degraded = True
+            if self.degraded:
+                self._next_frame_time = current_time + elapsed * FRAME_BACKOFF
             self.char_count = 0
             self.last_update_time = current_time
 
+    def _commit(self, text: str) -> bool:
+        """Print the blocks completed by new text above the frame.
+
+        Returns False, with nothing written, when no block was completed.
+        Long text is fed to the splitter in pieces of whole lines, so the
+        blocks of a large read are rendered and written a piece at a time
+        rather than held all at once.
+        """
+        assert self._splitter is not None and self._committed is not None
+        committed = False
+        start = 0
+        while start < len(text):
+            end = text.find("\n", start + COMMIT_PIECE_SIZE)
+            end = len(text) if end < 0 else end + 1
+            completed = self._splitter.feed(text[start:end])
+            start = end
+            last = start == len(text)
+            if not completed and not (committed and last):
+                continue
+            with self.console:
+                if not committed:
+                    self._clear_previous_output()
+                    committed = True
+                # Committed blocks are final, so they are highlighted in full
+                self._committed.render_blocks(completed)
+                if last:
+                    self._buffer = _StreamBuffer(self._splitter.held)
+                    self.last_rendered_content = ""
+                    self._render_current_state()
+        return committed
+
+    @property
+    def buffer(self) -> str:
+        """All text received so far, or with split_blocks, not yet committed."""
+        with self._lock:
+            return self._buffer.text()
+
+    @buffer.setter
+    def buffer(self, text: str) -> None:
+        with self._lock:
+            self._buffer = _StreamBuffer(text)
+            self._document = IncrementalParser()
+
+    @property
+    def open_block(self) -> str:
+        """The text of the block still being written (after the last blank line)."""
+        return self._buffer.text_from(self._buffer.block_start)
+
+    def append(self, text: str) -> None:
+        """Add text to the buffer without drawing a frame."""
+        with self._lock:
+            self._buffer.append(text)
+
+    def frame_due(self) -> bool:
+        """Whether a live frame may be drawn now.
+
+        Frames that overran the budget space out the following ones.
+        """
+        return time.time() >= self._next_frame_time
+
+    def render_lines(self, live: bool = True) -> List[str]:
+        """Render the buffer off screen and return the output lines.
+
+        Live frames are timed against the frame budget like the ones
+        ``add_text`` draws, and degrade the same way once one overruns it.
+        """
+        with self._lock:
+            output = StringIO()
+            console = make_console(
+                self.console.size.width, self.console.color_system, output
+            )
+            content = self.buffer
+            started = time.perf_counter()
+            if content.strip():
+                try:
+                    self._render_to(
+                        console, content, not (live and self.degraded), live
+                    )
+                except Exception:
+                    console.print(content, end="")
+            if live:
+                elapsed = time.perf_counter() - started
+                self.frame_times.append(elapsed)
+                if elapsed > self.frame_budget:
+                    self.degraded = True
+                if self.degraded:
+                    self._next_frame_time = time.time() + elapsed * FRAME_BACKOFF
+
+            lines = output.getvalue().split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            return lines
+
     def render_complete(self, text: str) -> None:
         """Render complete text (for non-streaming mode)."""
-        self.buffer = text
-        self._render_final()
+        with self._lock:
+            self.buffer = text
+            self._render_final()
 
     def _looks_complete(self) -> bool:
         """Check if the buffer ends with what looks like complete markdown elements."""
-        if not self.buffer:
+        buffer = self._buffer
+        if not buffer.length:
             return False
 
         # Consider complete if ends with:
         # - Double newline (paragraph break)
         # - Single newline after certain patterns
-        if self.buffer.endswith("\n\n"):
+        if buffer.tail == "\n\n":
             return True
 
-        if self.buffer.endswith("\n"):
-            lines = self.buffer.rstrip().split("\n")
-            if lines:
-                last_line = lines[-1].strip()
-                # Complete if last line looks like a complete element
-                if (
-                    last_line.startswith("#")  # Heading
-                    or last_line.startswith("- ")  # List item
-                    or last_line.startswith("> ")  # Blockquote
-                    or last_line == "---"  # Horizontal rule
-                    or not last_line
-                ):  # Empty line
-                    return True
+        if buffer.tail.endswith("\n"):
+            # The last line with text, tracked as text arrives
+            last_line = buffer.last_text_line
+            # Complete if last line looks like a complete element
+            if (
+                last_line.startswith("#")  # Heading
+                or last_line.startswith("- ")  # List item
+                or last_line.startswith("> ")  # Blockquote
+                or last_line == "---"  # Horizontal rule
+                or not last_line
+            ):  # Empty line
+                return True
 
         return False
 
     def _render_current_state(self) -> None:
         """Render the current buffer state with minimal re-rendering."""
-        # Only re-render if content has actually changed
-        if self.buffer == self.last_rendered_content:
+        # Only re-render if content has actually changed; comparing lengths
+        # first skips the string comparison while text is arriving
+        if self._buffer.length == len(self.last_rendered_content) and (
+            self.buffer == self.last_rendered_content
+        ):
             return
 
-        # Clear previous output
-        self._clear_previous_output()
+        # The whole frame is buffered and written at once
+        with self.console:
+            # Clear previous output
+            self._clear_previous_output()
 
-        # Render new content
-        try:
-            if self.buffer.strip():
-                self._render_and_count(self.buffer)
-            self.last_rendered_content = self.buffer
-        except Exception:
-            # Fallback to plain text if markdown parsing fails
-            self.console.print(self.buffer, end="")
-            self.last_rendered_lines = self.buffer.count("\n")
-            if self.buffer and not self.buffer.endswith("\n"):
-                self.last_rendered_lines += 1
+            # Render new content
+            try:
+                if self.buffer.strip():
+                    self._render_and_count(self.buffer)
+                self.last_rendered_content = self.buffer
+            except Exception:
+                # Fallback to plain text if markdown parsing fails
+                self.console.print(self.buffer, end="")
+                self._record_output(self.buffer)
+
+    def request_resize(self, width: int) -> None:
+        """Note a new terminal width; output is reflowed on the next update.
+
+        This only records the width, so it is safe to call from a signal
+        handler.
+        """
+        self._pending_width = width
+
+    def _apply_resize(self) -> None:
+        """Re-lay out the content on screen at the pending terminal width."""
+        width = self._pending_width
+        self._pending_width = None
+        if width is None or width == self.console.size.width:
+            return
+
+        with self.console:
+            # The terminal has already reflowed what is on screen to the new
+            # width, so erase by the rows it occupies now
+            self._clear_previous_output(width)
+            self.console.width = width
+
+            # Reuse the parsed blocks and highlighted code; only layout is redone
+            if self.last_rendered_content.strip():
+                try:
+                    self._render_and_count(self.last_rendered_content)
+                except Exception:
+                    self.console.print(self.last_rendered_content, end="")
+                    self._record_output(self.last_rendered_content)
+
+    def _parse(self, content: str, live: bool = False) -> Optional[Tuple[Block, ...]]:
+        """Parse content into blocks, reusing the previous parse of the same text.
+
+        Live frames parse the buffer incrementally, as do final renders of
+        a buffer that live frames already parsed part of; text rendered
+        only once is parsed in one go.  Returns None when the content takes
+        the plain-text fast path.
+        """
+        if content != self._parsed_text:
+            if self._splitter is not None:
+                # The fast path cannot continue a document after committed
+                # blocks, and links may refer to definitions in them
+                references = dict(self._splitter.references)
+                self._parsed_blocks = parse_blocks(content, references)
+            elif _is_block_simple(content):
+                self._parsed_blocks = None
+            elif (live or self._document.length) and (
+                len(content) >= self._document.length
+            ):
+                # Content is the buffer, which only grows, so the text not
+                # yet seen is its end
+                self._document.feed(content[self._document.length :])
+                self._parsed_blocks = self._document.blocks()
+            else:
+                # Rendered once, or an earlier state of the buffer redrawn
+                # after a resize
+                self._parsed_blocks = parse_blocks(content)
+            self._parsed_text = content
+        return self._parsed_blocks
+
+    def _render_to(
+        self, console: Console, content: str, highlight: bool = True, live: bool = False
+    ) -> None:
+        """Render content to a console using the cached parse.
+
+        Live frames highlight a trailing code block whose fence is still open
+        incrementally; everything else is highlighted in full.
+        """
+        blocks = self._parse(content, live)
+        if blocks is None:
+            _render_simple(console, content, self.theme)
+            return
+        open_code = None
+        if live and blocks and self._buffer.in_fence:
+            last = blocks[-1]
+            if isinstance(last, CodeBlock):
+                open_code = last
+        renderer = TerminalRenderer(console, self.theme, highlight, open_code)
+        if self._committed is not None:
+            # Space the frame as if it followed the committed blocks
+            renderer._previous_block = self._committed._previous_block
+        renderer.render_blocks(blocks)
+
+    def _record_output(self, output: str) -> None:
+        """Remember the lines just written to the screen."""
+        lines = output.split("\n") if output else []
+        if output.endswith("\n"):
+            lines.pop()
+        self._output_lines = lines
+        self.last_rendered_lines = len(lines)
+
+    def _output_rows(self, width: int) -> int:
+        """Count the terminal rows the lines on screen occupy at a width."""
+        rows = 0
+        for line in self._output_lines:
+            # No character is wider than two cells, so most lines need no
+            # measuring to know they fit
+            if len(line) * 2 <= width:
+                rows += 1
+            else:
+                line_width = _cell_width(line)
+                rows += (line_width - 1) // width + 1 if line_width else 1
+        return rows
 
     def _render_and_count(self, content: str) -> None:
         """Render content and accurately count the output lines."""
@@ -507,239 +2457,889 @@ class StreamingRenderer:
             legacy_windows=False,
         )
 
-        # Parse and render to temp console
-        markdown = mistune.create_markdown(renderer=None)
-        tokens = markdown(content)
-        # Type assertion since we know renderer=None returns tokens
-        assert isinstance(tokens, list)
-        temp_renderer = TerminalRenderer(temp_console)
-        temp_renderer.render(tokens)
-
-        # Get the actual output
-        output = temp_buffer.getvalue()
-
-        # Now render to the real console
-        real_renderer = TerminalRenderer(self.console)
-        real_renderer.render(tokens)
+        # Render the same parsed blocks to the temp console and the real one
+        highlight = not self.degraded
+        self._render_to(temp_console, content, highlight, live=True)
+        self._render_to(self.console, content, highlight, live=True)
 
         # Count lines accurately from the actual output
-        self.last_rendered_lines = len(output.split("\n")) - 1
-        if output and not output.endswith("\n"):
-            self.last_rendered_lines += 1
+        self._record_output(temp_buffer.getvalue())
+
+    def _clear_previous_output(self, width: Optional[int] = None) -> None:
+        """Clear the previous output using accurate line count.
 
-    def _clear_previous_output(self) -> None:
-        """Clear the previous output using accurate line count."""
+        Lines wider than the terminal (after it shrank) occupy several rows,
+        so the rows to erase are counted at the given or current width.
+        """
         if self.last_rendered_lines > 0:
-            # Move cursor up and clear each line
-            for _ in range(self.last_rendered_lines):
-                self.console.file.write("\033[1A\033[2K")
-            self.console.file.flush()
+            width = max(1, width or self.console.size.width)
+            if self._output_lines:
+                rows = self._output_rows(width)
+            else:
+                rows = self.last_rendered_lines
+            # Move cursor up and clear each line; queued with the redraw
+            # when called inside a frame, so both go out in one write
+            self.console.control(Control(*_ERASE_LINE * rows))
             self.last_rendered_lines = 0
+            self._output_lines = []
 
     def _render_final(self) -> None:
         """Render the final complete content."""
-        # Clear any current output
-        self._clear_previous_output()
+        with self.console:
+            # Clear any current output
+            self._clear_previous_output()
 
-        # Render everything as markdown
-        if self.buffer.strip():
-            try:
-                markdown = mistune.create_markdown(renderer=None)
-                tokens = markdown(self.buffer)
-                # Type assertion since we know renderer=None returns tokens
-                assert isinstance(tokens, list)
-                renderer = TerminalRenderer(self.console)
-                renderer.render(tokens)
-            except Exception:
-                # Fallback to plain text
-                self.console.print(self.buffer, end="")
+            # Render everything as markdown
+            if self.buffer.strip():
+                try:
+                    self._render_to(self.console, self.buffer)
+                except Exception:
+                    # Fallback to plain text
+                    self.console.print(self.buffer, end="")
 
     def finalize(self) -> None:
         """Finalize the rendering (called when input is complete)."""
-        # Clear current output and render final content
-        self._clear_previous_output()
+        with self._lock:
+            self._finalize()
+
+    def _finalize(self) -> None:
+        if self._pending_width is not None:
+            self._apply_resize()
+
+        unterminated = self._buffer.length and not self._buffer.tail.endswith("\n")
+        with self.console:
+            # Clear current output and render final content
+            self._clear_previous_output()
+
+            if self._splitter is not None and self._committed is not None:
+                self._committed.render_blocks(self._splitter.close())
+                self._buffer = _StreamBuffer()
+            elif self.buffer.strip():
+                try:
+                    self._render_to(self.console, self.buffer)
+                except Exception:
+                    # Fallback to plain text
+                    self.console.print(self.buffer, end="")
+
+            # Ensure we end with a newline if we don't already
+            if unterminated:
+                self.console.print()
 
-        if self.buffer.strip():
-            try:
-                markdown = mistune.create_markdown(renderer=None)
-                tokens = markdown(self.buffer)
-                # Type assertion since we know renderer=None returns tokens
-                assert isinstance(tokens, list)
-                renderer = TerminalRenderer(self.console)
-                renderer.render(tokens)
-            except Exception:
-                # Fallback to plain text
-                self.console.print(self.buffer, end="")
 
-        # Ensure we end with a newline if we don't already
-        if self.buffer and not self.buffer.endswith("\n"):
-            self.console.print()
+@contextmanager
+def follow_terminal_resize(renderer: StreamingRenderer) -> Iterator[None]:
+    """Reflow a streaming renderer's output whenever the terminal is resized.
+
+    Installs a SIGWINCH handler for the duration of the block.  On platforms
+    without SIGWINCH, or outside the main thread, this does nothing.
+    """
+    if (
+        not hasattr(signal, "SIGWINCH")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def on_resize(signum: int, frame: Any) -> None:
+        renderer.request_resize(shutil.get_terminal_size().columns)
+
+    previous = signal.signal(signal.SIGWINCH, on_resize)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGWINCH, previous)
+
+
+# Seconds between frames drawn by a StreamCompositor
+DEFAULT_FRAME_INTERVAL = 0.05
+
+
+class _Region:
+    """One stream's area of the screen in a StreamCompositor."""
+
+    __slots__ = ("renderer", "header", "height", "lines", "rows", "dirty")
+
+    def __init__(
+        self, renderer: StreamingRenderer, header: List[str], height: Optional[int]
+    ) -> None:
+        self.renderer = renderer
+        # Prerendered title lines shown above the stream's output
+        self.header = header
+        # Live frames show at most this many of the stream's last lines
+        self.height = height
+        # Lines of the latest render, header included, and the number of
+        # rows the region takes up on screen
+        self.lines: List[str] = list(header)
+        self.rows = 0
+        self.dirty = False
+
+
+class StreamCompositor:
+    """Render several markdown streams at once, each in its own screen region.
+
+    Regions are stacked top to bottom below the cursor.  Text added to a
+    region only marks it as changed; on a shared frame clock the changed
+    regions are re-rendered and the screen is updated with one combined
+    write, rewriting only from the first changed region down and skipping
+    over unchanged regions whose position did not move.  Rendering work
+    therefore scales with the regions that changed, not with the total
+    amount of text on screen.
+
+    Cursor movement cannot reach rows that have scrolled off the top of the
+    terminal, so the regions together should fit on the screen; give each a
+    ``height`` to keep live frames to its last lines.  ``finalize()`` writes
+    every region in full.
+
+    Frames are drawn from ``add_text`` when one is due.  Text that arrives
+    sooner is drawn by the next frame: call ``tick()`` regularly, or
+    ``start()`` a clock thread that does so until ``finalize()``.
+    """
+
+    def __init__(
+        self,
+        console: Console,
+        theme: Optional[MarkdownTheme] = None,
+        frame_interval: float = DEFAULT_FRAME_INTERVAL,
+        frame_budget: float = DEFAULT_FRAME_BUDGET,
+    ):
+        self.console = console
+        self.theme = theme or DEFAULT_THEME
+        self.frame_interval = frame_interval
+        self.frame_budget = frame_budget
+        self.regions: List[_Region] = []
+        self._next_frame_time = 0.0
+        # Streams are often produced by separate threads
+        self._lock = threading.RLock()
+        self._clock: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _capture_console(self) -> Console:
+        """Create an off-screen console matching the real one."""
+        return make_console(
+            self.console.size.width, self.console.color_system, StringIO()
+        )
+
+    def start(self) -> "StreamCompositor":
+        """Draw due frames on a background thread until ``finalize()``."""
+        self._clock = threading.Thread(
+            target=self._run_clock, name="md2term-compositor", daemon=True
+        )
+        self._clock.start()
+        return self
+
+    def _run_clock(self) -> None:
+        """Tick once per frame interval until stopped."""
+        interval = self.frame_interval or DEFAULT_FRAME_INTERVAL
+        while not self._stopped.wait(interval):
+            self.tick()
+
+    def add_region(
+        self, title: Optional[str] = None, height: Optional[int] = None
+    ) -> int:
+        """Add a region below the existing ones and return its index."""
+        header: List[str] = []
+        if title is not None:
+            console = self._capture_console()
+            console.print(Rule(title, style=self.theme.styles["rule"]))
+            header = console.file.getvalue().splitlines()  # type: ignore[attr-defined]
+        renderer = StreamingRenderer(
+            self._capture_console(), self.theme, self.frame_budget
+        )
+        with self._lock:
+            self.regions.append(_Region(renderer, header, height))
+            self.regions[-1].dirty = bool(header)
+            return len(self.regions) - 1
+
+    def add_text(self, region: int, text: str) -> None:
+        """Add text to a region's stream, drawing a frame if one is due."""
+        with self._lock:
+            target = self.regions[region]
+            target.renderer.append(text)
+            target.dirty = True
+            self.tick()
+
+    def tick(self) -> None:
+        """Draw a frame if one is due and a region changed since the last."""
+        with self._lock:
+            if time.monotonic() >= self._next_frame_time and any(
+                region.dirty for region in self.regions
+            ):
+                self.render_frame()
+
+    def render_frame(self) -> None:
+        """Re-render the changed regions and update the screen in one write."""
+        with self._lock:
+            now = time.monotonic()
+            self._next_frame_time = now + self.frame_interval
+            changed = []
+            for index, region in enumerate(self.regions):
+                # Regions whose frames overran the budget are drawn less often
+                if region.dirty and region.renderer.frame_due():
+                    changed.append(index)
+                    region.lines = self._render_region(region, live=True)
+                    region.dirty = False
+            if changed:
+                self._write_regions(changed[0], set(changed))
+
+    def _render_region(self, region: _Region, live: bool) -> List[str]:
+        """Render a region's stream off screen and return its lines."""
+        lines = region.renderer.render_lines(live)
+        if live and region.height is not None:
+            lines = lines[-region.height :] if region.height > 0 else []
+        return region.header + lines
+
+    def _write_regions(
+        self, first: int, changed: Set[int], old_rows: Optional[List[int]] = None
+    ) -> None:
+        """Rewrite the screen from region ``first`` down.
+
+        The cursor rests on the row below the last region.  Regions after
+        the first changed one are skipped with a cursor movement if they are
+        unchanged and did not move, and rewritten from their cached lines
+        otherwise.
+        """
+        regions = self.regions
+        if old_rows is None:
+            old_rows = [region.rows for region in regions]
+        parts = []
+        up = sum(old_rows[first:])
+        if up:
+            parts.append(f"\r\033[{up}A")
+        moved = False
+        for index in range(first, len(regions)):
+            region = regions[index]
+            rows = len(region.lines)
+            if index not in changed and not moved:
+                if rows:
+                    parts.append(f"\033[{rows}B")
+                continue
+            for line in region.lines:
+                parts.append(f"\033[2K{line}\n")
+            moved = moved or rows != old_rows[index]
+            region.rows = rows
+        if sum(old_rows[first:]) > sum(len(region.lines) for region in regions[first:]):
+            # Erase whatever is left below from a taller previous frame
+            parts.append("\033[J")
+        self.console.file.write("".join(parts))
+        self.console.file.flush()
+
+    def finalize(self) -> None:
+        """Stop the clock and render every region in full, with full fidelity."""
+        self._stopped.set()
+        if self._clock is not None and self._clock is not threading.current_thread():
+            self._clock.join()
+        with self._lock:
+            if not self.regions:
+                return
+            old_rows = [region.rows for region in self.regions]
+            for region in self.regions:
+                region.lines = self._render_region(region, live=False)
+                region.dirty = False
+            self._write_regions(0, set(range(len(self.regions))), old_rows)
+
+
+# Seconds a live stream waits for input before checking for a due frame
+STREAM_POLL_INTERVAL = 0.05
+
+# Input is read in chunks of up to this many bytes (or characters)
+READ_CHUNK_SIZE = 65536
+
+# Default cap on text read ahead of the renderer before reading pauses
+DEFAULT_READ_AHEAD = 8 * 1024 * 1024
 
 
-def convert(markdown_text: str, width: Optional[int] = None) -> None:
+class InputReader:
+    """Drain an input stream on a background thread into a bounded buffer.
+
+    The reader thread reads whatever is available as soon as it arrives, so
+    a fast producer is never held up by slow terminal rendering.  Text piles
+    up in memory until the renderer takes it; reading only pauses (and the
+    producer is only blocked) once ``max_pending`` characters are waiting.
+    """
+
+    def __init__(
+        self, input_stream: TextIO, max_pending: int = DEFAULT_READ_AHEAD
+    ) -> None:
+        self.input_stream = input_stream
+        self.max_pending = max(1, max_pending)
+        self._chunks: List[str] = []
+        self._pending = 0
+        self._eof = False
+        self._error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name="md2term-reader", daemon=True
+        )
+
+    def start(self) -> "InputReader":
+        """Start the reader thread."""
+        self._thread.start()
+        return self
+
+    def _read_chunks(self) -> Iterator[str]:
+        """Yield text from the stream as soon as it is available."""
+        try:
+            fd = self.input_stream.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # In-memory streams (e.g. in tests) never block on a read
+            fd = None
+
+        if fd is None:
+            while True:
+                chunk = self.input_stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+        # A buffered text read waits for a full chunk; os.read returns what
+        # the pipe holds right now
+        encoding = getattr(self.input_stream, "encoding", None) or "utf-8"
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        while True:
+            data = os.read(fd, READ_CHUNK_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                yield text
+            if not data:
+                return
+
+    def _run(self) -> None:
+        try:
+            for chunk in self._read_chunks():
+                with self._condition:
+                    # Backpressure: wait for the renderer to catch up
+                    while self._pending >= self.max_pending:
+                        self._condition.wait()
+                    self._chunks.append(chunk)
+                    self._pending += len(chunk)
+                    self._condition.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            with self._condition:
+                self._eof = True
+                self._condition.notify_all()
+
+    def read(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Take all text read so far, waiting up to ``timeout`` for some.
+
+        Returns an empty string if nothing arrived in time, and None once
+        the stream is exhausted.  Errors from the reader thread are raised
+        here.
+        """
+        with self._condition:
+            if not self._chunks and not self._eof:
+                self._condition.wait(timeout)
+            if self._chunks:
+                text = "".join(self._chunks)
+                self._chunks = []
+                self._pending = 0
+                self._condition.notify_all()
+                return text
+            if self._eof:
+                if self._error is not None:
+                    raise self._error
+                return None
+            return ""
+
+
+def convert(
+    markdown_text: str,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    color_system: Optional[str] = "256",
+) -> None:
     """
     Convert markdown text to terminal-formatted text and print it.
 
     Args:
         markdown_text: The markdown content to convert
         width: Terminal width override (defaults to current terminal width)
+        theme: Styles to render with (defaults to the built-in theme)
+        color_system: Rich color system, "auto" to detect it, or None for
+            plain text
     """
     # Get terminal width
     if width is None:
         width = shutil.get_terminal_size().columns
 
     # Create console with proper width
-    console = Console(width=width, force_terminal=True, color_system="256")
+    console = make_console(width, color_system)
 
     # Use the unified streaming renderer for consistent output
-    renderer = StreamingRenderer(console)
+    renderer = StreamingRenderer(console, theme)
     renderer.render_complete(markdown_text)
 
 
-def process_stream(input_stream: TextIO, width: Optional[int] = None) -> None:
+def process_stream(
+    input_stream: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    color_system: Optional[str] = "256",
+) -> None:
     """
     Process markdown from a stream line by line using the unified streaming renderer.
 
-    This function reads the input stream line by line and uses the streaming
-    renderer to provide consistent output with minimal flickering.
+    Each line is classified as it arrives.  Blocks are printed once, as soon
+    as a line shows that they are complete, and live frames only redraw the
+    block still being written, so the cost of a line does not grow with the
+    length of the document.
     """
-    # Get terminal width
+    # Get terminal width, following resizes unless it was given explicitly
+    follow_resize = width is None
     if width is None:
         width = shutil.get_terminal_size().columns
 
     # Create console with proper width
-    console = Console(width=width, force_terminal=True, color_system="256")
+    console = make_console(width, color_system)
 
     # Create streaming renderer
-    renderer = StreamingRenderer(console)
+    renderer = StreamingRenderer(console, theme, split_blocks=True)
+    resize_guard = follow_terminal_resize(renderer) if follow_resize else nullcontext()
 
-    try:
-        # Read line by line and add to renderer
-        for line in input_stream:
-            renderer.add_text(line)
-    except KeyboardInterrupt:
-        pass
-    finally:
-        # Finalize the rendering
-        renderer.finalize()
+    with resize_guard:
+        try:
+            # Read line by line and add to renderer
+            for line in input_stream:
+                renderer.add_text(line)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Finalize the rendering
+            renderer.finalize()
 
 
-def process_character_stream(input_stream: TextIO, width: Optional[int] = None) -> None:
+def process_character_stream(
+    input_stream: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    color_system: Optional[str] = "256",
+) -> None:
     """
     Process markdown from a stream character by character with backtracking support.
 
     This function is designed for LLM streaming where text arrives in small chunks
     and markdown syntax may be incomplete until more text arrives.
     """
-    # Get terminal width
+    # Get terminal width, following resizes unless it was given explicitly
+    follow_resize = width is None
     if width is None:
         width = shutil.get_terminal_size().columns
 
     # Create console with proper width
-    console = Console(width=width, force_terminal=True, color_system="256")
+    console = make_console(width, color_system)
 
     # Create streaming renderer
-    renderer = StreamingRenderer(console)
+    renderer = StreamingRenderer(console, theme)
+    resize_guard = follow_terminal_resize(renderer) if follow_resize else nullcontext()
 
-    try:
-        # Read character by character
-        while True:
-            char = input_stream.read(1)
-            if not char:  # EOF
-                break
+    with resize_guard:
+        try:
+            # Read character by character
+            while True:
+                char = input_stream.read(1)
+                if not char:  # EOF
+                    break
+
+                renderer.add_text(char)
 
-            renderer.add_text(char)
+                # Small delay to simulate streaming (can be removed in production)
+                # time.sleep(0.01)
 
-            # Small delay to simulate streaming (can be removed in production)
-            # time.sleep(0.01)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Finalize the rendering
+            renderer.finalize()
 
-    except KeyboardInterrupt:
-        pass
-    finally:
-        # Finalize the rendering
-        renderer.finalize()
 
+def _write_trace_header(trace: TextIO, width: int) -> None:
+    """Start a trace with the version and width it was recorded at."""
+    trace.write(json.dumps({"md2term": __version__, "width": width}) + "\n")
 
-def process_smart_stream(input_stream: TextIO, width: Optional[int] = None) -> None:
+
+def _write_trace_chunk(trace: TextIO, started: float, text: str) -> None:
+    """Log a chunk of input with its arrival time, in seconds from ``started``."""
+    record = {"t": round(time.monotonic() - started, 6), "text": text}
+    trace.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def process_smart_stream(
+    input_stream: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    max_pending: int = DEFAULT_READ_AHEAD,
+    trace: Optional[TextIO] = None,
+    color_system: Optional[str] = "256",
+    split_blocks: bool = False,
+) -> None:
     """
-    Process markdown from a stream with character-by-character reading.
+    Process markdown from a stream read on a background thread.
+
+    Input is drained as fast as the producer writes it, while rendering
+    catches up with everything read so far at its own pace.  Reading only
+    pauses once ``max_pending`` characters are waiting to be rendered.
 
-    Simple and reliable approach that works for all input types.
+    If ``trace`` is given, every chunk handed to the renderer is logged to it
+    with its arrival time, for ``replay_trace``.  With ``split_blocks``,
+    finished blocks are printed once and released, so memory use stays flat
+    however long the stream runs.
     """
-    # Get terminal width
+    # Get terminal width, following resizes unless it was given explicitly
+    follow_resize = width is None
     if width is None:
         width = shutil.get_terminal_size().columns
 
     # Create console with proper width
-    console = Console(width=width, force_terminal=True, color_system="256")
+    console = make_console(width, color_system)
 
     # Create streaming renderer
-    renderer = StreamingRenderer(console)
+    renderer = StreamingRenderer(console, theme, split_blocks=split_blocks)
+    resize_guard = follow_terminal_resize(renderer) if follow_resize else nullcontext()
+    reader = InputReader(input_stream, max_pending).start()
+    if trace is not None:
+        _write_trace_header(trace, width)
+    started = time.monotonic()
+
+    with resize_guard:
+        try:
+            while True:
+                # Wake up regularly so time-based updates still happen while
+                # the producer is quiet
+                text = reader.read(timeout=STREAM_POLL_INTERVAL)
+                if text is None:  # EOF
+                    break
+                if trace is not None and text:
+                    _write_trace_chunk(trace, started, text)
+                renderer.add_text(text)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Finalize the rendering
+            renderer.finalize()
+
+
+@dataclass(frozen=True)
+class ReplayStats:
+    """Frame statistics from replaying a streaming trace."""
+
+    chunks: int
+    chars: int
+    wall_time: float
+    frame_times: Tuple[float, ...]
+    degraded: bool
+
+    def summary(self) -> str:
+        """Describe the replay in two lines."""
+        times = sorted(self.frame_times)
+        frames = len(times)
+        lines = [
+            f"Replayed {self.chunks:,} chunks ({self.chars:,} chars) in "
+            f"{self.wall_time:.2f}s: {frames:,} frames, "
+            f"{sum(times):.2f}s rendering"
+        ]
+        if frames:
+
+            def ms(fraction: float) -> str:
+                return f"{times[min(frames - 1, int(frames * fraction))] * 1000:.1f}"
+
+            lines.append(
+                f"Frame ms: mean {sum(times) / frames * 1000:.1f}, p50 {ms(0.5)}, "
+                f"p95 {ms(0.95)}, max {times[-1] * 1000:.1f}; "
+                f"degraded: {'yes' if self.degraded else 'no'}"
+            )
+        return "\n".join(lines)
+
+
+def replay_trace(
+    trace: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    speed: Optional[float] = 1.0,
+    color_system: Optional[str] = "256",
+) -> ReplayStats:
+    """
+    Feed a trace written by ``process_smart_stream`` back through the renderer.
 
+    Chunks arrive at their recorded times divided by ``speed``, with the same
+    idle wake-ups as a live stream, or back to back if ``speed`` is None.
+    The width is the recorded one unless given.
+    """
+    records = []
+    for line in iter(trace.readline, ""):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "text" in record:
+            records.append(record)
+        elif width is None:
+            width = record.get("width")
+    if width is None:
+        width = shutil.get_terminal_size().columns
+
+    console = make_console(width, color_system)
+    renderer = StreamingRenderer(console, theme)
+    started = time.monotonic()
     try:
-        # Try to use select for optimization, but fall back gracefully
-        import select
+        for record in records:
+            if speed is not None:
+                due = started + record["t"] / speed
+                # Idle wake-ups, as process_smart_stream has while input is quiet
+                while (delay := due - time.monotonic()) > 0:
+                    time.sleep(min(delay, STREAM_POLL_INTERVAL))
+                    if delay >= STREAM_POLL_INTERVAL:
+                        renderer.add_text("")
+            renderer.add_text(record["text"])
+    finally:
+        renderer.finalize()
 
-        use_select = False
+    return ReplayStats(
+        chunks=len(records),
+        chars=sum(len(record["text"]) for record in records),
+        wall_time=time.monotonic() - started,
+        frame_times=tuple(renderer.frame_times),
+        degraded=renderer.degraded,
+    )
+
+
+def process_batch(
+    input_stream: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    color_system: Optional[str] = "256",
+) -> None:
+    """
+    Read a stream to the end and render it once, without redraws.
 
-        try:
-            # Check if we can use select (requires real file descriptor)
-            if hasattr(select, "select") and hasattr(input_stream, "fileno"):
-                # Test if fileno() actually works
-                input_stream.fileno()
-                use_select = True
-        except (AttributeError, OSError, io.UnsupportedOperation):
-            # fileno() not available or not supported (e.g., in tests)
-            use_select = False
+    Used when output is not a terminal: nothing is erased, so no cursor
+    movement sequences end up in files or logs, and the markdown is only
+    parsed and rendered a single time.
+    """
+    if width is None:
+        width = shutil.get_terminal_size().columns
 
-        if use_select:
-            # Use select to optimize reading
-            while True:
-                # Check if data is available
-                ready, _, _ = select.select([input_stream], [], [], 0.01)
-
-                if ready:
-                    # Read a small chunk
-                    chunk = input_stream.read(64)  # Smaller chunks for better streaming
-                    if not chunk:  # EOF
-                        break
-                    renderer.add_text(chunk)
-                else:
-                    # No data available, try single character read
-                    char = input_stream.read(1)
-                    if not char:  # EOF
-                        break
-                    renderer.add_text(char)
-        else:
-            # Fallback to character-by-character reading
-            while True:
-                char = input_stream.read(1)
-                if not char:  # EOF
-                    break
-                renderer.add_text(char)
+    console = make_console(width, color_system)
+    renderer = StreamingRenderer(console, theme)
 
+    try:
+        renderer.buffer = input_stream.read()
     except KeyboardInterrupt:
         pass
-    except Exception:
-        # If anything goes wrong, fall back to simple character reading
-        try:
-            while True:
-                char = input_stream.read(1)
-                if not char:  # EOF
-                    break
-                renderer.add_text(char)
-        except KeyboardInterrupt:
-            pass
     finally:
-        # Finalize the rendering
         renderer.finalize()
 
 
+def process_block_stream(
+    input_stream: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    color_system: Optional[str] = "256",
+    trace: Optional[TextIO] = None,
+) -> None:
+    """
+    Render a stream block by block, writing each block once it is complete.
+
+    Nothing is ever erased, so this suits output that is not a terminal but
+    is still read as it arrives (``tail -f``, log shippers).  Only the block
+    still being written is held in memory, and every block is parsed and
+    rendered a bounded number of times.
+
+    If ``trace`` is given, every line read is logged to it with its arrival
+    time, for ``replay_trace``.
+    """
+    if width is None:
+        width = shutil.get_terminal_size().columns
+
+    console = make_console(width, color_system)
+    renderer = TerminalRenderer(console, theme)
+    splitter = BlockSplitter()
+    last_char = ""
+    if trace is not None:
+        _write_trace_header(trace, width)
+    started = time.monotonic()
+
+    try:
+        while True:
+            line = input_stream.readline()
+            if not line:  # EOF
+                break
+            if trace is not None:
+                _write_trace_chunk(trace, started, line)
+            renderer.render_blocks(splitter.feed(line))
+            last_char = line[-1:]
+    except KeyboardInterrupt:
+        pass
+    finally:
+        renderer.render_blocks(splitter.close())
+        # End with a newline, as the streaming renderer does
+        if last_char and last_char != "\n":
+            console.print()
+
+
+def _render_jsonl_record(
+    width: int,
+    theme: Optional[MarkdownTheme],
+    color_system: Optional[str],
+    line: str,
+) -> str:
+    """Render one ``{"id", "markdown", "width"}`` record to ``{"id", "ansi"}``.
+
+    ``width`` applies to records that do not give their own.
+    """
+    record: Any = None
+    try:
+        record = json.loads(line)
+        markdown_text = record["markdown"]
+        if not isinstance(markdown_text, str):
+            raise TypeError("'markdown' must be a string")
+        ansi = render_ansi(
+            markdown_text, int(record.get("width") or width), theme, color_system
+        )
+        result = {"id": record.get("id"), "ansi": ansi}
+    except Exception as e:
+        # A bad record is reported in place, without stopping the batch
+        record_id = record.get("id") if isinstance(record, dict) else None
+        result = {"id": record_id, "error": f"{type(e).__name__}: {e}"}
+    return json.dumps(result, ensure_ascii=False)
+
+
+def process_jsonl(
+    input_stream: TextIO,
+    output_stream: TextIO,
+    width: Optional[int] = None,
+    theme: Optional[MarkdownTheme] = None,
+    jobs: int = 1,
+    color_system: Optional[str] = "256",
+) -> None:
+    """
+    Render a stream of JSONL markdown records to JSONL records of ANSI text.
+
+    Each input line is ``{"id": ..., "markdown": "...", "width": 80}`` (width
+    is optional) and produces ``{"id": ..., "ansi": "..."}`` on the same line
+    of the output, or ``{"id": ..., "error": "..."}`` if it cannot be
+    rendered.  One parser, theme and set of caches serve every record; with
+    ``jobs`` above one, records are rendered by that many worker processes
+    and written in input order.
+    """
+    lines = (line for line in iter(input_stream.readline, "") if line.strip())
+    # The settings travel with the function, so concurrent calls never share them
+    render_record = functools.partial(
+        _render_jsonl_record, width or 80, theme, color_system
+    )
+
+    if jobs <= 1:
+        for line in lines:
+            output_stream.write(render_record(line) + "\n")
+        output_stream.flush()
+        return
+
+    import multiprocessing
+
+    with multiprocessing.Pool(jobs) as pool:
+        for result in pool.imap(render_record, lines, chunksize=16):
+            output_stream.write(result + "\n")
+    output_stream.flush()
+
+
+def _stream_mode(mode: str, output: TextIO) -> str:
+    """Resolve the ``auto`` mode to ``stream`` for terminals, else ``blocks``."""
+    if mode != "auto":
+        return mode
+    try:
+        return "stream" if output.isatty() else "blocks"
+    except (AttributeError, ValueError):
+        return "blocks"
+
+
 @click.command()
 @click.argument("input_file", type=click.File("r"), required=False)
 @click.option("--width", "-w", type=int, help="Override terminal width")
+@click.option(
+    "--mode",
+    type=click.Choice(["auto", "stream", "tail", "blocks", "batch"]),
+    default="auto",
+    show_default=True,
+    help="Redraw stdin as it streams, redraw only the block being written "
+    "and forget finished ones (tail, for endless streams), write each block "
+    "once it is complete, or render it once at EOF "
+    "(auto: stream to a terminal, otherwise blocks)",
+)
+@click.option(
+    "--read-ahead",
+    type=click.IntRange(min=1),
+    default=DEFAULT_READ_AHEAD // 1024,
+    show_default=True,
+    help="KiB of stdin to hold ahead of rendering before pausing input",
+)
+@click.option(
+    "--jsonl",
+    is_flag=True,
+    help='Render JSONL records {"id", "markdown", "width"} to {"id", "ansi"}',
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Worker processes for --jsonl",
+)
+@click.option(
+    "--record",
+    type=click.File("w"),
+    help="Log each stdin chunk and its arrival time to a JSONL trace file",
+)
+@click.option(
+    "--replay",
+    type=click.File("r"),
+    help="Stream a trace file written by --record and report frame stats",
+)
+@click.option(
+    "--speed",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    show_default=True,
+    help="Replay speed multiplier for --replay",
+)
+@click.option(
+    "--max",
+    "max_speed",
+    is_flag=True,
+    help="Replay as fast as possible, without the recorded delays",
+)
+@click.option(
+    "--color",
+    type=click.Choice(list(COLOR_SYSTEMS)),
+    default="auto",
+    show_default=True,
+    help="Colors to write (auto: detect from the terminal; none: plain text)",
+)
+@click.option(
+    "--guess-lang",
+    is_flag=True,
+    help="Guess the language of code blocks that do not name one",
+)
+@click.option(
+    "--theme",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Load styles from a JSON theme file",
+)
 @click.version_option(version=__version__)
-def main(input_file: Optional[TextIO], width: Optional[int]) -> None:
+def main(
+    input_file: Optional[TextIO],
+    width: Optional[int],
+    mode: str,
+    read_ahead: int,
+    jsonl: bool,
+    jobs: int,
+    record: Optional[TextIO],
+    replay: Optional[TextIO],
+    speed: float,
+    max_speed: bool,
+    color: str,
+    guess_lang: bool,
+    theme: Optional[str],
+) -> None:
     """
     Parse Markdown and turn it into nicely-formatted text for terminal display.
 
@@ -760,20 +3360,80 @@ def main(input_file: Optional[TextIO], width: Optional[int]) -> None:
     echo "# Hello" | md2term             # Render from stdin
     cat file.md | pv -qL 20 | md2term    # Simulate streaming input
     md2term --width 60 README.md         # Set custom width
+    md2term --theme dark.json README.md  # Use custom styles
+    cat notes.md | md2term --mode batch  # Render once, without redraws
+    tail -f agent.md | md2term --mode tail  # Follow an endless stream
+    md2term --jsonl -j 4 < in.jsonl      # Render many documents to JSONL
+    md2term --color none README.md       # Plain text, without escape codes
+    llm 'hi' | md2term --record t.jsonl  # Record a stream's chunks and timing
+    md2term --replay t.jsonl --max       # Replay it and report frame stats
 
     The renderer automatically handles both complete files and streaming input,
     with intelligent backtracking when markdown syntax is incomplete.
     """
+    if record is not None:
+        if input_file is not None or jsonl or replay is not None:
+            raise click.UsageError(
+                "--record traces stdin and cannot be used with INPUT_FILE, "
+                "--jsonl or --replay"
+            )
+        if mode == "batch":
+            raise click.UsageError("--record needs --mode stream, tail or blocks")
     try:
+        markdown_theme = None
+        if theme:
+            overrides = {"guess_language": True} if guess_lang else {}
+            markdown_theme = MarkdownTheme.load(theme, **overrides)
+        elif guess_lang:
+            markdown_theme = MarkdownTheme(guess_language=True)
+
+        color_system = COLOR_SYSTEMS[color]
+
         # Read the input
-        if input_file is None:
-            # For stdin, just use character streaming for simplicity and reliability
-            process_smart_stream(sys.stdin, width)
+        if jsonl:
+            # Records are not written to a terminal, so there is none to detect
+            process_jsonl(
+                input_file or sys.stdin,
+                sys.stdout,
+                width,
+                markdown_theme,
+                jobs,
+                "256" if color == "auto" else color_system,
+            )
+        elif replay is not None:
+            stats = replay_trace(
+                replay,
+                width,
+                markdown_theme,
+                None if max_speed else speed,
+                color_system,
+            )
+            print(stats.summary(), file=sys.stderr)
+        elif input_file is None:
+            stream_mode = _stream_mode(mode, sys.stdout)
+            if stream_mode == "blocks":
+                # Output is not a terminal, so write each block exactly once
+                process_block_stream(
+                    sys.stdin, width, markdown_theme, color_system, record
+                )
+            elif stream_mode == "batch":
+                process_batch(sys.stdin, width, markdown_theme, color_system)
+            else:
+                # Read on a background thread and render as text arrives
+                process_smart_stream(
+                    sys.stdin,
+                    width,
+                    markdown_theme,
+                    read_ahead * 1024,
+                    record,
+                    color_system,
+                    split_blocks=stream_mode == "tail",
+                )
         else:
             # For files, read all at once and use the unified renderer
             content = input_file.read()
             if content.strip():
-                convert(content, width)
+                convert(content, width, markdown_theme, color_system)
 
     except KeyboardInterrupt:
         # Handle Ctrl+C gracefully
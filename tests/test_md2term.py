@@ -3,10 +3,43 @@ Tests for md2term module using snapshot testing.
 """
 
 import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
 from click.testing import CliRunner
 
-from md2term import convert, main, TerminalRenderer
+from md2term import (
+    convert,
+    guess_language,
+    make_console,
+    main,
+    parse_blocks,
+    process_batch,
+    process_block_stream,
+    process_jsonl,
+    process_smart_stream,
+    process_stream,
+    replay_trace,
+    render_ansi,
+    render_markdown,
+    Heading,
+    InputReader,
+    ListBlock,
+    MarkdownTheme,
+    Paragraph,
+    TerminalRenderer,
+    READ_CHUNK_SIZE,
+    StreamCompositor,
+    StreamingRenderer,
+)
 from rich.console import Console
+from rich.style import Style
+from rich.text import Text
 
 
 def create_test_console(output, width=80):
@@ -425,6 +458,59 @@ The next paragraph shows how text wraps naturally based on the terminal width, w
         result = output.getvalue()
         assert result == snapshot
 
+    def test_blockquote_nested_content(self, snapshot):
+        """Test that quoted markup, brackets and nested blocks survive."""
+        markdown = """> Check [x] the **bold** box and [link](https://example.com).
+>
+> - item `one`
+> - item [two]
+
+> [!WARNING]
+> Keep [brackets] and _styles_ intact."""
+
+        output = io.StringIO()
+        console = create_test_console(output)
+        renderer = TerminalRenderer(console)
+        renderer.render_blocks(parse_blocks(markdown))
+
+        result = output.getvalue()
+        plain = Text.from_ansi(result).plain
+        assert "│ Check [x] the bold box and link (https://example.com)." in plain
+        assert "│ • item [two]" in plain
+        assert "Keep [brackets] and styles intact." in plain
+        assert result == snapshot
+
+    def test_tables(self, snapshot):
+        """Test GFM tables with alignment and inline formatting."""
+        markdown = """| Feature | Status | Notes |
+|:--------|:------:|------:|
+| Tables | **done** | aligned columns |
+| Code | `yes` | with _emphasis_ |
+| Links | [docs](https://example.com) | 3 |"""
+
+        output = io.StringIO()
+        console = create_test_console(output)
+        renderer = TerminalRenderer(console)
+        renderer.render_blocks(parse_blocks(markdown))
+
+        result = output.getvalue()
+        assert result == snapshot
+
+    def test_table_narrow_width(self, snapshot):
+        """Test that wide tables shrink their widest columns to fit."""
+        markdown = """| Key | Description |
+|-----|-------------|
+| a | A rather long description that cannot fit in a narrow terminal |
+| b | Short |"""
+
+        output = io.StringIO()
+        console = create_test_console(output, width=30)
+        renderer = TerminalRenderer(console)
+        renderer.render_blocks(parse_blocks(markdown))
+
+        result = output.getvalue()
+        assert result == snapshot
+
 
 class TestCLIInterface:
     """Test the CLI interface with snapshot testing."""
@@ -474,6 +560,77 @@ class TestCLIInterface:
         assert result.output == snapshot
 
 
+class TestOutputModes:
+    """Test choosing between streaming redraws and batch output."""
+
+    markdown_input = "# Title\n\nFirst paragraph.\n\nSecond paragraph.\n\n"
+
+    def test_blocks_mode_for_non_tty(self):
+        """Output that is not a terminal is written once, with no erase codes."""
+        runner = CliRunner(env={"FORCE_COLOR": "1", "TERM": "xterm-256color"})
+        result = runner.invoke(main, input=self.markdown_input)
+        assert result.exit_code == 0
+        assert "\033[1A" not in result.output
+        assert result.output.count("Title") == 1
+
+        batch = runner.invoke(main, ["--mode", "batch"], input=self.markdown_input)
+        assert result.output == batch.output
+
+    def test_stream_mode_redraws(self):
+        """Forcing stream mode redraws even when output is not a terminal."""
+        runner = CliRunner(env={"FORCE_COLOR": "1", "TERM": "xterm-256color"})
+        result = runner.invoke(main, ["--mode", "stream"], input=self.markdown_input)
+        assert result.exit_code == 0
+        assert "\033[1A\033[2K" in result.output
+
+    def test_batch_matches_final_stream_frame(self):
+        """Batch output is what streaming leaves on screen at the end."""
+        runner = CliRunner(env={"FORCE_COLOR": "1", "TERM": "xterm-256color"})
+        batch = runner.invoke(main, ["--mode", "batch"], input=self.markdown_input)
+        stream = runner.invoke(main, ["--mode", "stream"], input=self.markdown_input)
+        assert stream.output.endswith(batch.output)
+
+    def test_tail_mode_leaves_the_batch_output(self):
+        """Tail mode prints finished blocks once and redraws only the rest."""
+        runner = CliRunner(env={"FORCE_COLOR": "1", "TERM": "xterm-256color"})
+        batch = runner.invoke(main, ["--mode", "batch"], input=self.markdown_input)
+        tail = runner.invoke(main, ["--mode", "tail"], input=self.markdown_input)
+        assert tail.exit_code == 0
+        assert tail.output.count("Title") == 1
+        assert TestStreamingRenderer.final_screen(tail.output) == batch.output
+
+    def test_blocks_written_as_they_complete(self, monkeypatch):
+        """Each block is written before the input after it has been read."""
+        output = io.StringIO()
+        monkeypatch.setattr("sys.stdout", output)
+        lines = iter(["# Title\n", "\n", "Text\n", "\n", "- item\n", ""])
+        written = []
+
+        class SlowInput:
+            def readline(self):
+                written.append(output.getvalue())
+                return next(lines)
+
+        process_block_stream(SlowInput(), 40)
+        # The heading appears once the paragraph after it starts
+        assert "Title" not in written[2]
+        assert "Title" in written[3]
+        assert "Text" in written[5] and "item" not in written[5]
+        assert "item" in output.getvalue()
+
+    def test_blocks_match_batch_output(self, monkeypatch):
+        """Block-by-block output is identical to rendering all at once."""
+        with open("large_test.md") as f:
+            markdown = f.read()
+        outputs = []
+        for process in (process_batch, process_block_stream):
+            output = io.StringIO()
+            monkeypatch.setattr("sys.stdout", output)
+            process(io.StringIO(markdown), 60)
+            outputs.append(output.getvalue())
+        assert outputs[0] == outputs[1]
+
+
 class TestEdgeCases:
     """Test edge cases and error conditions."""
 
@@ -608,6 +765,1302 @@ class TestSpecialCharacters:
         result = output.getvalue()
         assert result == snapshot
 
+    def test_cell_widths_match_rich(self):
+        """Cached widths agree with Rich for wide, zero-width and ASCII text."""
+        from rich.cells import cell_len
+        import md2term
+
+        for text in [
+            "",
+            "plain",
+            "日本語のテキスト",
+            "⚠️ Warning",
+            "📝 e\u0301",
+            "• 中",
+        ]:
+            assert md2term._cell_width(text) == cell_len(text)
+            assert md2term._cell_width(text) == cell_len(text)
+
+    def test_wide_list_items_align(self, snapshot):
+        """CJK list items wrap with their continuation lines under the text."""
+        markdown = (
+            "- 東京は日本の首都であり、世界最大の都市圏の一つです。\n" "  1. 大阪\n"
+        )
+        output = io.StringIO()
+        render_markdown(create_test_console(output, width=30), markdown)
+        assert output.getvalue() == snapshot
+
+
+class TestBlockModel:
+    """Test the intermediate block representation."""
+
+    def test_blocks_are_typed(self):
+        """Parsed blocks use the typed block classes."""
+        blocks = parse_blocks("# Title\n\nSome **text**.\n\n- one\n- two")
+        kinds = [type(block) for block in blocks]
+        assert kinds[0] is Heading
+        assert Paragraph in kinds
+        assert isinstance(blocks[-1], ListBlock)
+        assert len(blocks[-1].items) == 2
+
+    def test_blocks_hash_and_compare(self):
+        """Identical markdown produces equal, hashable blocks."""
+        first = parse_blocks("Some *emphasis* and `code`.\n\n> quoted")
+        second = parse_blocks("Some *emphasis* and `code`.\n\n> quoted")
+        assert first == second
+        assert hash(first) == hash(second)
+        assert parse_blocks("Other text.") != first
+
+    def test_render_blocks_matches_render(self):
+        """Rendering blocks directly matches rendering mistune tokens."""
+        import mistune
+
+        with open("example.md", "r") as f:
+            markdown = f.read()
+
+        token_output = io.StringIO()
+        tokens = mistune.create_markdown(renderer=None)(markdown)
+        TerminalRenderer(create_test_console(token_output)).render(tokens)
+
+        block_output = io.StringIO()
+        renderer = TerminalRenderer(create_test_console(block_output))
+        renderer.render_blocks(parse_blocks(markdown))
+
+        assert block_output.getvalue() == token_output.getvalue()
+
+    def test_table_layout_extends_incrementally(self):
+        """Streaming more rows into a table only measures the new rows."""
+        import md2term
+
+        header = "| Name | Value |\n|------|-------|\n"
+        rows = [f"| row {i} | {i} |\n" for i in range(50)]
+        rendered = []
+        renderer = TerminalRenderer(create_test_console(io.StringIO()))
+
+        def render_cell(cell):
+            rendered.append(cell)
+            return renderer._render_inline_tokens(cell)
+
+        md2term._TABLE_LAYOUTS.clear()
+        for count in (10, 11, 50):
+            (table,) = parse_blocks(header + "".join(rows[:count]))
+            layout = md2term._table_layout(table, render_cell)
+
+        # Header cells plus each row's two cells, each rendered exactly once
+        assert len(rendered) == 2 + 2 * 50
+        assert layout.widths == [len("row 49"), len("Value")]
+
+
+class TestFastPath:
+    """Test the plain-text fast path against the full rendering pipeline."""
+
+    def render_both(self, markdown, width=80):
+        """Render through the fast path and the full pipeline."""
+        from md2term import _render_simple
+
+        fast_output = io.StringIO()
+        used_fast_path = _render_simple(
+            create_test_console(fast_output, width), markdown
+        )
+
+        full_output = io.StringIO()
+        TerminalRenderer(create_test_console(full_output, width)).render_blocks(
+            parse_blocks(markdown)
+        )
+        return used_fast_path, fast_output.getvalue(), full_output.getvalue()
+
+    def test_plain_prose_matches_full_pipeline(self):
+        """Plain paragraphs render identically through the fast path."""
+        markdown = (
+            "\nThe quick brown fox jumps over the lazy dog, again and again.\n"
+            "A soft break joins this line.\n\n\n"
+            "Unicode works too: café, naïve, 日本語のテキスト and 😀 emoji.\n\n"
+            "Averyveryverylongwordthatcannotfitonasinglelineatallinanarrowterminal\n\n"
+        )
+        for width in (20, 37, 80):
+            used_fast_path, fast, full = self.render_both(markdown, width)
+            assert used_fast_path
+            assert fast == full
+
+    def test_inline_marks_match_full_pipeline(self):
+        """Paragraphs with inline markup fall back per paragraph."""
+        markdown = "Plain first paragraph.\n\nThen **bold**, `code` and a [link](https://example.com).\n\nPlain again."
+        used_fast_path, fast, full = self.render_both(markdown)
+        assert used_fast_path
+        assert fast == full
+
+    PROSE = (
+        "plain one\n\nan *emph* two\n\nplain three\n\n"
+        "A longer plain paragraph that wraps across several lines of the "
+        "terminal.\n\nThen `code` again, and plain text to end.\n"
+    )
+
+    def test_convert_keeps_paragraph_order(self, capsys):
+        """Fast-path paragraphs are written in order with full-pipeline ones."""
+        convert(self.PROSE, width=40, color_system=None)
+        full = io.StringIO()
+        TerminalRenderer(make_console(40, None, full)).render_blocks(
+            parse_blocks(self.PROSE)
+        )
+        assert capsys.readouterr().out == full.getvalue()
+
+    @pytest.mark.parametrize("split_blocks", [False, True])
+    def test_streamed_frames_erase_before_drawing(self, split_blocks):
+        """Each frame's erase codes come before its fast-path text."""
+        expected = io.StringIO()
+        render_markdown(make_console(40, "256", expected), self.PROSE)
+
+        output = io.StringIO()
+        renderer = StreamingRenderer(
+            make_console(40, "256", output), split_blocks=split_blocks
+        )
+        for line in self.PROSE.splitlines(keepends=True):
+            renderer.add_text(line)
+            renderer._render_current_state()
+        renderer.finalize()
+        screen = TestStreamingRenderer.final_screen(output.getvalue())
+        assert screen == expected.getvalue()
+
+    def test_block_syntax_uses_full_pipeline(self):
+        """Input with block syntax is left to the full pipeline."""
+        for markdown in (
+            "# Heading",
+            "Text\n\n- item",
+            "Text\n\n> quote",
+            "```\ncode\n```",
+            "| a | b |\n|---|---|",
+            "Title\n=====",
+            "    indented code",
+            "1. first",
+        ):
+            used_fast_path, fast, full = self.render_both(markdown)
+            assert not used_fast_path
+            assert fast == ""
+
+
+class TestListRendering:
+    """Test list layout."""
+
+    def test_wrapped_items_hang_under_their_text(self):
+        """Continuation lines are indented past the marker."""
+        output = io.StringIO()
+        markdown = (
+            "- a long item with **bold text** that wraps onto a second line\n"
+            "  - nested item with `code` that also wraps onto a second line\n"
+            "10. ordered item long enough to wrap onto a second line too\n"
+        )
+        render_markdown(create_test_console(output, width=30), markdown)
+        lines = Text.from_ansi(output.getvalue()).plain.splitlines()
+        assert lines[0].startswith("• a long item")
+        assert lines[1].startswith("  ") and lines[1][2] != " "
+        assert lines[3].startswith("  • nested item")
+        assert lines[4].startswith("    ") and lines[4][4] != " "
+        ordered = lines.index(next(line for line in lines if line.startswith("10.")))
+        assert lines[ordered + 1].startswith("    ") and lines[ordered + 1][4] != " "
+        assert all(len(line) <= 30 for line in lines)
+
+    def test_nested_lists_print_once(self):
+        """A list and all its nested lists are emitted in a single print."""
+        console = create_test_console(io.StringIO())
+        prints = []
+        print_ = console.print
+        console.print = lambda *args, **kwargs: prints.append(args) or print_(
+            *args, **kwargs
+        )
+        markdown = "".join(f"- item {i}\n  - sub {i}\n    - leaf\n" for i in range(50))
+        TerminalRenderer(console).render_blocks(parse_blocks(markdown))
+        assert len(prints) == 1
+        assert prints[0][0].plain.count("\n") == 149
+
+
+class TestInlineRendering:
+    """Test inline rendering into a single Text."""
+
+    def render_inline(self, markdown):
+        """Render the inline content of a one-paragraph document."""
+        (paragraph,) = parse_blocks(markdown)
+        renderer = TerminalRenderer(create_test_console(io.StringIO()))
+        return renderer._render_inline_tokens(paragraph.children)
+
+    def test_nested_styles_combine_outermost_last(self):
+        """Outer styles take precedence over inner ones."""
+        text = self.render_inline("**bold `code` and [link](https://x.io)**")
+        assert text.plain == "bold code and link (https://x.io)"
+        styles = {text.plain[span.start : span.end]: span.style for span in text.spans}
+        assert str(styles["bold "]) == "bold"
+        assert str(styles["code"]) == "bold red on black"
+        assert str(styles["link"]) == "bold underline blue"
+        assert str(styles[" (https://x.io)"]) == "bold dim blue"
+
+    def test_control_codes_are_stripped(self):
+        """Control codes are removed without shifting style spans."""
+        text = self.render_inline("bell\x07 then **bold**")
+        assert text.plain == "bell then bold"
+        (span,) = text.spans
+        assert text.plain[span.start : span.end] == "bold"
+
+
+class TestStreamingRenderer:
+    """Test the streaming renderer's redraw bookkeeping."""
+
+    def test_buffer_tracks_open_block(self):
+        """The open block starts after the last blank line outside a fence."""
+        renderer = StreamingRenderer(create_test_console(io.StringIO()))
+        renderer._render_current_state = lambda: None
+        for char in "# Title\n\nSome text\n\n```python\nx = 1\n\ny = 2\n":
+            renderer.add_text(char)
+        assert renderer.open_block == "```python\nx = 1\n\ny = 2\n"
+        assert renderer.buffer.endswith(renderer.open_block)
+
+        for char in "```\n\n- item":
+            renderer.add_text(char)
+        assert renderer.open_block == "- item"
+        assert not renderer._looks_complete()
+        renderer.add_text("\n")
+        assert renderer._looks_complete()
+
+    def test_slow_frames_degrade_until_finalize(self):
+        """Over-budget frames drop highlighting and are throttled, not finalize."""
+        output = io.StringIO()
+        renderer = StreamingRenderer(create_test_console(output), frame_budget=0)
+        code = "```python\ndef f():\n    return 1\n\n"
+        renderer.add_text(code)
+        assert renderer.degraded
+
+        # The next frame is held back for a multiple of the slow frame's time
+        output.truncate(0)
+        output.seek(0)
+        renderer.add_text("x = 2\n\n")
+        assert output.getvalue() == ""
+
+        renderer._next_frame_time = 0
+        renderer.add_text("y = 3\n\n")
+        frame = output.getvalue()
+        assert "def f():" in frame and "\x1b[94;49mdef" not in frame
+
+        output.truncate(0)
+        output.seek(0)
+        renderer.finalize()
+        assert "\x1b[94;49mdef" in output.getvalue()
+
+    def test_open_fence_lexes_only_new_lines(self, monkeypatch):
+        """Frames of a growing code fence lex each line about once."""
+        from rich.syntax import Syntax
+
+        lexed = []
+        highlight = Syntax.highlight
+
+        def counting_highlight(self, code, line_range=None):
+            lexed.append(len(code))
+            return highlight(self, code, line_range)
+
+        monkeypatch.setattr(Syntax, "highlight", counting_highlight)
+        renderer = StreamingRenderer(create_test_console(io.StringIO()))
+        code_lines = [f"value_{i} = compute({i})  # step {i}\n" for i in range(40)]
+        renderer.add_text("```python\n")
+        for line in code_lines:
+            renderer.add_text(line)
+            renderer._render_current_state()
+        code_size = sum(len(line) for line in code_lines)
+        # Each new line is lexed as part of the complete lines and once more
+        # as the last line, in both the counting and the visible render
+        assert sum(lexed) <= 4 * code_size
+
+        # Closing the fence highlights the whole block from scratch
+        lexed.clear()
+        renderer.add_text("```\n")
+        renderer._render_current_state()
+        assert max(lexed) == code_size
+
+    def test_resize_reflows_without_reparsing(self, monkeypatch):
+        """A resize erases by rows at the new width and reuses the parse."""
+        import md2term
+
+        output = io.StringIO()
+        renderer = md2term.StreamingRenderer(create_test_console(output, width=60))
+        markdown = "# Title\n\n" + "word " * 30 + "\n\n```python\nprint('hi')\n```\n"
+        renderer.add_text(markdown)
+        renderer._render_current_state()
+        widths = [md2term._cell_width(line) for line in renderer._output_lines]
+        assert max(widths) == 60
+
+        calls = []
+        monkeypatch.setattr(
+            md2term, "parse_blocks", lambda *args, **kwargs: calls.append(args) or ()
+        )
+        output.truncate(0)
+        output.seek(0)
+        renderer.request_resize(25)
+        renderer.add_text("")
+
+        # Every 60-cell line now wraps over several 25-cell rows
+        expected_rows = sum((w - 1) // 25 + 1 if w else 1 for w in widths)
+        assert output.getvalue().count("\033[1A\033[2K") == expected_rows
+        assert renderer.console.width == 25
+        assert max(map(md2term._cell_width, renderer._output_lines)) <= 25
+        assert calls == []
+
+    @staticmethod
+    def final_screen(output):
+        """Replay erase sequences to get the text left on screen."""
+        frames = output.split("\033[1A\033[2K")
+        screen = frames[0]
+        for frame in frames[1:]:
+            # Move up into the last line written and clear it
+            screen = screen[: screen.rfind("\n", 0, len(screen) - 1) + 1] + frame
+        return screen
+
+    def test_split_blocks_leave_the_rendered_document(self):
+        """Line by line with a frame per line, the screen ends as one render."""
+        import md2term
+
+        with open("example.md") as f:
+            markdown = f.read()
+        expected = io.StringIO()
+        render_markdown(md2term.make_console(70, "256", expected), markdown)
+
+        output = io.StringIO()
+        renderer = StreamingRenderer(
+            md2term.make_console(70, "256", output), split_blocks=True
+        )
+        for line in markdown.splitlines(keepends=True):
+            renderer.add_text(line)
+            renderer._render_current_state()
+        renderer.finalize()
+        assert self.final_screen(output.getvalue()) == expected.getvalue()
+
+    def test_split_blocks_parse_only_the_open_block(self, monkeypatch):
+        """Committed blocks are never parsed or rendered again."""
+        import md2term
+
+        parsed = []
+        parse_blocks = md2term.parse_blocks
+        monkeypatch.setattr(
+            md2term,
+            "parse_blocks",
+            lambda text, references=None: parsed.append(text)
+            or parse_blocks(text, references),
+        )
+        sections = [
+            f"## Step {i}\nSome *text* for step {i}.\n- item\n- item\n"
+            f"```python\nprint({i})\n\nprint({i + 1})\n```\n"
+            for i in range(100)
+        ]
+        output = io.StringIO()
+        renderer = StreamingRenderer(create_test_console(output), split_blocks=True)
+        for line in "".join(sections).splitlines(keepends=True):
+            renderer.add_text(line)
+            renderer._render_current_state()
+        renderer.finalize()
+
+        assert max(len(text) for text in parsed) <= len(sections[0])
+        assert "Step 99" in output.getvalue()
+
+    def test_splitter_releases_at_block_starts(self, monkeypatch):
+        """Headings and closing fences end blocks without a blank line."""
+        import md2term
+
+        splitter = md2term.BlockSplitter()
+        assert splitter.feed("Some text\n") == ()
+        heading = splitter.feed("# Title\n")
+        assert [type(block) for block in heading] == [Paragraph]
+
+        fence = splitter.feed("```python\n")
+        assert [type(block) for block in fence] == [Heading]
+
+        # Lines inside a fence, blank or not, are never parsed
+        parsed = []
+        parse_blocks = md2term.parse_blocks
+        monkeypatch.setattr(
+            md2term,
+            "parse_blocks",
+            lambda text, references=None: parsed.append(text)
+            or parse_blocks(text, references),
+        )
+        for i in range(50):
+            assert splitter.feed(f"x = {i}\n\n") == ()
+        assert parsed == []
+        splitter.feed("```\n")
+        completed = splitter.feed("More text\n")
+        assert [type(block) for block in completed] == [md2term.CodeBlock]
+        assert splitter.held == "More text\n"
+
+    def test_splitter_turns_down_paragraph_lines_without_parsing(self, monkeypatch):
+        """Underlines and items that cannot interrupt text are not checked."""
+        import md2term
+
+        splitter = md2term.BlockSplitter()
+        parsed = []
+        parse_blocks = md2term.parse_blocks
+        monkeypatch.setattr(
+            md2term,
+            "parse_blocks",
+            lambda text, references=None: parsed.append(text)
+            or parse_blocks(text, references),
+        )
+        text = "Title\n---\nIt was\n1986. A good year\n-\nfor me.\n"
+        for line in text.splitlines(keepends=True):
+            assert splitter.feed(line) == ()
+        assert parsed == []
+        assert splitter.close() == parse_blocks(text)
+
+    def test_splitter_releases_long_blocks_past_its_limit(self):
+        """Past the limit, code and loose lists are released in parts."""
+        import md2term
+
+        splitter = md2term.BlockSplitter(held_limit=100)
+        blocks = splitter.feed("```python\n")
+        for i in range(50):
+            blocks += splitter.feed(f"x = {i}\n")
+        blocks += splitter.feed("```\n\n")
+        for i in range(50):
+            blocks += splitter.feed(f"- Item {i}\n\n")
+        blocks += splitter.close()
+
+        code = [block for block in blocks if isinstance(block, md2term.CodeBlock)]
+        assert len(code) > 1
+        assert {block.info for block in code} == {"python"}
+        assert "\n".join(block.code for block in code).splitlines() == [
+            f"x = {i}" for i in range(50)
+        ]
+        assert sum(isinstance(block, md2term.ListBlock) for block in blocks) > 1
+        assert len(splitter.held) < 100
+
+    def test_splitter_keeps_link_references(self):
+        """Definitions in released text still apply to later blocks."""
+        import md2term
+
+        splitter = md2term.BlockSplitter()
+        blocks = splitter.feed("[src]: https://example.com/src\n\n# Title\n\n")
+        blocks += splitter.feed("See [the source][src].\n\nDone.\n")
+        blocks += splitter.close()
+        assert splitter.held == ""
+        paragraph = [block for block in blocks if isinstance(block, Paragraph)][0]
+        link = paragraph.children[1]
+        assert (link.kind, link.url) == ("link", "https://example.com/src")
+
+    def test_incremental_parse_matches_whole_document(self):
+        """Links before their definition resolve as in a whole-document parse."""
+        import md2term
+
+        with open("example.md") as f:
+            example = f.read()
+        text = (
+            "See [the docs][docs] and [Foo].\n\n# Head\n\n"
+            + example
+            + "\nMore [docs] text.\n\n[docs]: https://example.com/docs\n"
+            "[foo]: https://foo.test\n\nAfter [docs].\n"
+        )
+        document = md2term.IncrementalParser()
+        for start in range(0, len(text), 37):
+            document.feed(text[start : start + 37])
+            assert document.blocks() == parse_blocks(text[: start + 37])
+
+    def test_new_reference_reparses_only_its_blocks(self, monkeypatch):
+        """A definition re-parses the released blocks using it, nothing else."""
+        import md2term
+
+        document = md2term.IncrementalParser()
+        document.feed("Uses [later].\n\n")
+        for i in range(50):
+            document.feed(f"Paragraph {i} with [x] and a [link](https://a.test).\n\n")
+        document.feed("Mentions [later] again.\n\n")
+
+        parsed = []
+        parse_blocks = md2term.parse_blocks
+        monkeypatch.setattr(
+            md2term,
+            "parse_blocks",
+            lambda text, references=None: parsed.append(text)
+            or parse_blocks(text, references),
+        )
+        document.feed("[later]: https://later.test\n\nEnd.\n")
+        assert "Uses [later].\n\n" in parsed
+        assert not any("Paragraph" in text for text in parsed)
+
+        first = document.blocks()[0]
+        assert isinstance(first, Paragraph)
+        assert first.children[1].url == "https://later.test"
+
+
+class TestStreamCompositor:
+    """Test rendering several streams into separate screen regions."""
+
+    def make_compositor(self, output):
+        return StreamCompositor(create_test_console(output, 40), frame_interval=0)
+
+    def test_only_changed_regions_are_rewritten(self):
+        """A frame moves past unchanged regions instead of redrawing them."""
+        output = io.StringIO()
+        compositor = self.make_compositor(output)
+        first = compositor.add_region("first")
+        second = compositor.add_region("second")
+        compositor.add_text(first, "alpha\n")
+        compositor.add_text(second, "beta\n")
+
+        start = output.tell()
+        first_lines = compositor.regions[first].lines
+        compositor.add_text(second, "more beta\n")
+        frame = output.getvalue()[start:]
+        assert compositor.regions[first].lines is first_lines
+        assert "alpha" not in frame
+        assert "more beta" in frame
+        # Up over the second region's title and line, then down past nothing
+        assert frame.startswith("\r\x1b[2A")
+
+    def test_growing_region_moves_the_ones_below(self):
+        """Regions below a region that grew are rewritten from cached lines."""
+        output = io.StringIO()
+        compositor = self.make_compositor(output)
+        first = compositor.add_region()
+        second = compositor.add_region()
+        compositor.add_text(first, "alpha\n")
+        compositor.add_text(second, "beta\n")
+
+        start = output.tell()
+        compositor.add_text(first, "\ngamma\n")
+        frame = output.getvalue()[start:]
+        assert frame.index("gamma") < frame.index("beta")
+        assert compositor.regions[second].rows == 1
+
+    def test_height_limits_live_frames(self):
+        """Live frames show a region's last lines; finalize shows them all."""
+        output = io.StringIO()
+        compositor = self.make_compositor(output)
+        region = compositor.add_region(height=2)
+        compositor.add_text(region, "one\n\ntwo\n\nthree\n")
+        assert Text.from_ansi("\n".join(compositor.regions[region].lines)).plain == (
+            "\nthree"
+        )
+        compositor.finalize()
+        lines = compositor.regions[region].lines
+        assert Text.from_ansi("\n".join(lines)).plain == "one\n\ntwo\n\nthree"
+
+    def test_tick_draws_text_added_between_frames(self, monkeypatch):
+        """Text that arrives before a frame is due is drawn by the next tick."""
+        import md2term
+
+        clock = FakeClock()
+        monkeypatch.setattr(md2term, "time", clock)
+        output = io.StringIO()
+        compositor = StreamCompositor(
+            create_test_console(output, 40), frame_interval=0.05
+        )
+        region = compositor.add_region()
+        compositor.add_text(region, "alpha\n")
+        compositor.add_text(region, "\nbeta\n")
+        assert "beta" not in output.getvalue()
+
+        compositor.tick()
+        assert "beta" not in output.getvalue()
+        clock.sleep(0.05)
+        compositor.tick()
+        assert "beta" in output.getvalue()
+
+        # Nothing changed since, so no frame is written
+        start = output.tell()
+        clock.sleep(0.05)
+        compositor.tick()
+        assert output.getvalue()[start:] == ""
+
+    def test_clock_thread_draws_pending_text(self):
+        """A started compositor draws text without further calls."""
+        output = io.StringIO()
+        compositor = StreamCompositor(
+            create_test_console(output, 40), frame_interval=0.01
+        ).start()
+        region = compositor.add_region()
+        compositor.add_text(region, "alpha\n")
+        compositor.add_text(region, "\nbeta\n")
+        deadline = time.monotonic() + 5
+        while "beta" not in output.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "beta" in output.getvalue()
+        compositor.finalize()
+        assert not compositor._clock.is_alive()
+
+
+class TestStreamTraces:
+    """Test recording streamed chunks and replaying them."""
+
+    MARKDOWN = "# Title\n\nSome **bold** text.\n\n```python\nx = 1\n```\n"
+
+    def record(self):
+        trace = io.StringIO()
+        process_smart_stream(io.StringIO(self.MARKDOWN), width=40, trace=trace)
+        return trace.getvalue()
+
+    def test_record_logs_chunks_with_times(self, capsys):
+        """Every chunk read is logged after a header with the width."""
+        lines = [json.loads(line) for line in self.record().splitlines()]
+        capsys.readouterr()
+        assert lines[0]["width"] == 40
+        assert "".join(line["text"] for line in lines[1:]) == self.MARKDOWN
+        times = [line["t"] for line in lines[1:]]
+        assert times == sorted(times)
+
+    def test_replay_renders_trace(self, capsys):
+        """A replayed trace renders like the stream it was recorded from."""
+        trace = self.record()
+        recorded = capsys.readouterr().out
+        stats = replay_trace(io.StringIO(trace), speed=None)
+        assert capsys.readouterr().out == recorded
+        assert stats.chars == len(self.MARKDOWN)
+        assert stats.summary().startswith(f"Replayed {stats.chunks} chunks")
+
+    def test_replay_keeps_recorded_timing(self):
+        """Chunks are spaced by their recorded times over the speed."""
+        trace = "".join(
+            json.dumps({"t": t, "text": f"line {t}\n"}) + "\n" for t in (0, 0.2, 0.4)
+        )
+        stats = replay_trace(io.StringIO(trace), width=40, speed=2)
+        assert 0.2 <= stats.wall_time < 1
+
+    def test_cli_record_and_replay(self, tmp_path):
+        """--record writes a trace that --replay --max plays back."""
+        path = tmp_path / "trace.jsonl"
+        runner = CliRunner()
+        result = runner.invoke(main, ["--record", str(path)], input=self.MARKDOWN)
+        assert result.exit_code == 0
+        result = runner.invoke(main, ["--replay", str(path), "--max"])
+        assert result.exit_code == 0
+        assert "Title" in result.stdout
+        assert "Replayed" in result.stderr
+
+    def test_cli_record_to_a_file_writes_blocks(self, tmp_path):
+        """Output that is not a terminal is recorded without any erasing."""
+        path = tmp_path / "trace.jsonl"
+        runner = CliRunner()
+        result = runner.invoke(main, ["--record", str(path)], input=self.MARKDOWN)
+        assert result.exit_code == 0
+        assert "\x1b[2K" not in result.output
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert "".join(line["text"] for line in lines[1:]) == self.MARKDOWN
+
+    @pytest.mark.parametrize(
+        "args",
+        [["INPUT"], ["--jsonl"], ["--mode", "batch"]],
+        ids=["input_file", "jsonl", "batch"],
+    )
+    def test_cli_record_needs_streamed_stdin(self, tmp_path, args):
+        """--record is refused where there is no stream to trace."""
+        source = tmp_path / "input.md"
+        source.write_text(self.MARKDOWN)
+        path = tmp_path / "trace.jsonl"
+        args = [str(source) if arg == "INPUT" else arg for arg in args]
+        result = CliRunner().invoke(main, ["--record", str(path), *args])
+        assert result.exit_code == 2
+        assert "--record" in result.output
+        assert not path.exists()
+
+
+class TestTheme:
+    """Test custom themes and style precomputation."""
+
+    def test_default_theme_is_shared(self):
+        """Renderers share the pre-parsed default theme."""
+        console = create_test_console(io.StringIO())
+        assert TerminalRenderer(console).theme is TerminalRenderer(console).theme
+
+    def test_custom_heading_style(self):
+        """A style override changes only the styled element."""
+        theme = MarkdownTheme(styles={"heading.3": "bold red"})
+        default_output = io.StringIO()
+        themed_output = io.StringIO()
+        render_markdown(create_test_console(default_output), "### Title", None)
+        render_markdown(create_test_console(themed_output), "### Title", theme)
+        assert "\x1b[1;95mTitle" in default_output.getvalue()
+        assert "\x1b[1;31mTitle" in themed_output.getvalue()
+
+    def test_load_theme_file(self, tmp_path):
+        """Themes load styles and callout titles from JSON."""
+        path = tmp_path / "theme.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "styles": {"list.bullet": "green"},
+                    "callouts": {"note": {"title": "FYI"}},
+                    "syntax_theme": "monokai",
+                }
+            )
+        )
+        theme = MarkdownTheme.load(str(path))
+        assert theme.styles["list.bullet"] == Style.parse("green")
+        assert theme.callouts["note"].title_text.plain == "📝  FYI"
+        assert theme.syntax_theme == "monokai"
+
+    def test_cli_theme_option(self, tmp_path):
+        """The --theme option applies a theme file to the output."""
+        path = tmp_path / "theme.json"
+        path.write_text(json.dumps({"styles": {"heading.3": "bold red"}}))
+        runner = CliRunner()
+        result = runner.invoke(main, ["--theme", str(path)], input="### Title\n")
+        assert result.exit_code == 0
+        assert "Title" in result.output
+
+
+class TestColorSystems:
+    """Test rendering with each color system."""
+
+    MARKDOWN = "### Title\n\nSome **bold** `code`.\n\n```python\nx = 1\n```\n"
+
+    def render(self, color_system, theme=None):
+        output = io.StringIO()
+        render_markdown(make_console(40, color_system, output), self.MARKDOWN, theme)
+        return output.getvalue()
+
+    def test_none_writes_plain_text(self, monkeypatch):
+        """Without colors no escape codes are written and nothing is lexed."""
+        from pygments.lexer import Lexer
+
+        def fail(*args, **kwargs):
+            raise AssertionError("lexed code that is not colored")
+
+        monkeypatch.setattr(Lexer, "get_tokens", fail)
+        plain = self.render(None)
+        assert "\x1b" not in plain
+        assert plain.rstrip("\n") == Text.from_ansi(self.render("256")).plain
+
+    def test_styles_follow_each_consoles_color_system(self):
+        """A shared style is converted for every color system it is used in."""
+        theme = MarkdownTheme({"heading.3": "bold #ff8700"})
+        assert "38;2;255;135;0" in self.render("truecolor", theme)
+        assert "38;5;208" in self.render("256", theme)
+        assert "38;2;255;135;0" in self.render("truecolor", theme)
+
+    def test_cli_color_option(self):
+        """--color none writes no escape codes, --color 256 does."""
+        runner = CliRunner()
+        result = runner.invoke(main, ["--color", "none"], input="# Title\n")
+        assert result.exit_code == 0
+        assert "Title" in result.output
+        assert "\x1b[" not in result.output
+        result = runner.invoke(main, ["--color", "256"], input="# Title\n")
+        assert "\x1b[" in result.output
+
+
+class TestFrameWrites:
+    """Test that output is collected and written once per frame."""
+
+    MARKDOWN = (
+        "# Title\n\nSome **bold** text.\n\n- one\n- two\n\n```python\nx = 1\n```\n"
+    )
+
+    @pytest.fixture
+    def writes(self, monkeypatch):
+        import md2term
+
+        calls = []
+        write = os.write
+
+        def counting_write(fd, data):
+            calls.append(bytes(data))
+            return write(fd, data)
+
+        monkeypatch.setattr(md2term.os, "write", counting_write)
+        return calls
+
+    def test_document_is_one_write(self, tmp_path, writes):
+        """A rendered document goes to the descriptor in one write."""
+        expected = io.StringIO()
+        render_markdown(make_console(60, "256", expected), self.MARKDOWN)
+
+        path = tmp_path / "out.txt"
+        with open(path, "w", encoding="utf-8") as output:
+            render_markdown(make_console(60, "256", output), self.MARKDOWN)
+
+        assert len(writes) == 1
+        assert path.read_bytes() == expected.getvalue().encode()
+
+    def test_streaming_frame_is_one_write(self, tmp_path, writes):
+        """Erasing the previous frame and drawing the next is one write."""
+        path = tmp_path / "out.txt"
+        with open(path, "w", encoding="utf-8") as output:
+            renderer = StreamingRenderer(make_console(60, "256", output))
+            renderer.add_text(self.MARKDOWN[:20])
+            renderer._render_current_state()
+            renderer.add_text(self.MARKDOWN[20:])
+            renderer._render_current_state()
+
+        assert len(writes) == 2
+        assert writes[1].startswith(b"\033[1A\033[2K")
+        assert b"Title" in writes[1]
+
+    def test_files_without_descriptor(self, writes):
+        """Files without a descriptor are written through the file object."""
+        output = io.StringIO()
+        render_markdown(make_console(60, "256", output), self.MARKDOWN)
+        assert writes == []
+        assert "Title" in output.getvalue()
+
+
+class TestBoundedMemory:
+    """Test that --mode tail keeps memory flat however long the stream is."""
+
+    SECTION = (
+        "## Step {i}\n\nThe agent reads [the file][src] and runs `make` "
+        "for step {i}.\n\n- checked **{i}** items\n- all passed\n\n"
+        "```python\nprint({i})\n```\n\n[src]: https://example.com/src\n\n"
+    )
+
+    # One loose list that never ends, held by the block splitter
+    LOOSE_ITEM = "- Step {i} reads [the file][src] and runs `make`\n\n"
+
+    # Characters streamed by the long run; MD2TERM_SOAK_BYTES=1000000000
+    # streams a gigabyte
+    SOAK_BYTES = int(os.environ.get("MD2TERM_SOAK_BYTES", 400_000))
+
+    def peak_rss(self, size, section=SECTION):
+        """Stream about ``size`` characters through --mode tail in a child.
+
+        Returns the child's peak resident set size in KiB.
+        """
+        pytest.importorskip("resource")
+        script = (
+            "import resource, sys, md2term\n"
+            "try:\n"
+            "    md2term.main()\n"
+            "finally:\n"
+            "    usage = resource.getrusage(resource.RUSAGE_SELF)\n"
+            "    sys.stderr.write(f'\\n{usage.ru_maxrss}')\n"
+        )
+        args = ["--mode", "tail", "--width", "80", "--color", "none"]
+        child = subprocess.Popen(
+            [sys.executable, "-c", script, *args, "--read-ahead", "64"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        assert child.stdin is not None
+        sent = 0
+        i = 0
+        while sent < size:
+            text = "".join(section.format(i=j) for j in range(i, i + 100))
+            child.stdin.write(text.encode())
+            sent += len(text)
+            i += 100
+        child.stdin.close()
+        stderr = child.stderr.read().decode() if child.stderr else ""
+        assert child.wait() == 0, stderr
+        peak = int(stderr.split()[-1])
+        # Linux reports KiB, macOS bytes
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+    def test_tail_mode_peak_rss_is_flat(self):
+        """Streaming many times more text does not raise peak memory."""
+        short = self.peak_rss(20_000)
+        long = self.peak_rss(self.SOAK_BYTES)
+        assert long - short < 8 * 1024
+
+    def test_tail_mode_peak_rss_is_flat_for_a_loose_list(self):
+        """A block that never ends is committed in parts instead of growing."""
+        short = self.peak_rss(20_000, self.LOOSE_ITEM)
+        long = self.peak_rss(self.SOAK_BYTES, self.LOOSE_ITEM)
+        assert long - short < 8 * 1024
+
+
+class TestInputReader:
+    """Test the background stdin reader."""
+
+    def read_all(self, reader):
+        chunks = []
+        while True:
+            text = reader.read(timeout=1)
+            if text is None:
+                return "".join(chunks)
+            chunks.append(text)
+
+    def test_reads_in_memory_stream(self):
+        """Streams without a file descriptor are read to the end."""
+        reader = InputReader(io.StringIO("# Title\n\nSome text\n")).start()
+        assert self.read_all(reader) == "# Title\n\nSome text\n"
+
+    def test_producer_not_blocked_by_renderer(self):
+        """A pipe is drained while nothing is consuming the text."""
+        read_fd, write_fd = os.pipe()
+        # Far more than a pipe buffer holds, with multi-byte characters
+        payload = "héllo wörld 🚀\n" * 20000
+
+        def produce():
+            with os.fdopen(write_fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+
+        with os.fdopen(read_fd, "r", encoding="utf-8") as stream:
+            reader = InputReader(stream).start()
+            producer = threading.Thread(target=produce)
+            producer.start()
+            producer.join(timeout=5)
+            assert not producer.is_alive()
+            assert self.read_all(reader) == payload
+
+    def test_read_ahead_is_capped(self):
+        """Reading pauses once the cap is reached, until text is taken."""
+        stream = io.StringIO("x" * (READ_CHUNK_SIZE * 4))
+        reader = InputReader(stream, max_pending=1).start()
+        first = reader.read(timeout=1)
+        assert first == "x" * READ_CHUNK_SIZE
+        time.sleep(0.05)
+        assert reader._pending <= READ_CHUNK_SIZE
+        assert len(first) + len(self.read_all(reader)) == READ_CHUNK_SIZE * 4
+
+
+class TestCodeBlocks:
+    """Test lexer resolution and language guessing for code blocks."""
+
+    def test_lexer_lookups_are_cached(self, monkeypatch):
+        """Known and unknown languages are looked up once."""
+        import md2term
+
+        calls = []
+        lookup = md2term.get_lexer_by_name
+
+        def counting_lookup(name, **options):
+            calls.append(name)
+            return lookup(name, **options)
+
+        monkeypatch.setattr(md2term, "get_lexer_by_name", counting_lookup)
+        monkeypatch.setattr(md2term, "_LEXER_CACHE", {})
+        monkeypatch.setattr(md2term, "_HIGHLIGHT_CACHE", {})
+        markdown = "```python\nx = 1\n```\n\n```nosuchlang\ny\n```\n"
+        for width in (80, 60, 80):
+            render_markdown(create_test_console(io.StringIO(), width), markdown)
+        assert sorted(calls) == ["nosuchlang", "python"]
+
+    def test_guess_language(self):
+        """Unlabeled code is recognized from its first line with text."""
+        assert guess_language("\n#!/usr/bin/env python3\nprint()") == "python"
+        assert guess_language('{\n  "name": "md2term"\n}') == "json"
+        assert guess_language("$ pip install md2term") == "console"
+        assert guess_language("Just some prose.") is None
+        assert guess_language("") is None
+
+    def test_guessing_is_opt_in(self):
+        """Unlabeled code is only highlighted when the theme asks for it."""
+        markdown = "```\ndef f():\n    return 1\n```\n"
+        plain = io.StringIO()
+        guessed = io.StringIO()
+        render_markdown(create_test_console(plain), markdown)
+        render_markdown(
+            create_test_console(guessed),
+            markdown,
+            MarkdownTheme(guess_language=True),
+        )
+        assert "\x1b[94;49mdef" not in plain.getvalue()
+        assert "\x1b[94;49mdef" in guessed.getvalue()
+
+
+class TestJsonl:
+    """Test bulk rendering of JSONL records."""
+
+    RECORDS = [
+        {"id": "a", "markdown": "# Title\n\nSome **bold** text."},
+        {"id": 2, "markdown": "- one\n- two\n\n```python\nx = 1\n```", "width": 30},
+        {
+            "id": "c",
+            "markdown": "A paragraph that is long enough to wrap.",
+            "width": 20,
+        },
+    ]
+
+    def run(self, lines, **kwargs):
+        output = io.StringIO()
+        process_jsonl(io.StringIO("".join(lines)), output, **kwargs)
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_records_round_trip(self):
+        """Each record renders like a standalone document at its own width."""
+        lines = [json.dumps(record) + "\n" for record in self.RECORDS]
+        results = self.run(lines, width=40)
+        assert [result["id"] for result in results] == ["a", 2, "c"]
+        for record, result in zip(self.RECORDS, results):
+            width = record.get("width", 40)
+            assert result["ansi"] == render_ansi(record["markdown"], width)
+
+    def test_bad_records_are_reported_in_place(self):
+        """Malformed records produce an error record and do not stop the batch."""
+        lines = ["not json\n", "\n", '{"id": 7}\n', json.dumps(self.RECORDS[0])]
+        results = self.run(lines)
+        assert len(results) == 3
+        assert results[0]["id"] is None and "error" in results[0]
+        assert results[1]["id"] == 7 and "markdown" in results[1]["error"]
+        assert results[2]["ansi"] == render_ansi(self.RECORDS[0]["markdown"])
+
+    def test_jobs_keep_input_order(self):
+        """Records rendered by worker processes come back in input order."""
+        lines = [
+            json.dumps({"id": i, "markdown": f"## Doc {i}\n\nBody *{i}*"}) + "\n"
+            for i in range(40)
+        ]
+        assert self.run(lines, jobs=2) == self.run(lines)
+
+    def test_concurrent_batches_keep_their_settings(self):
+        """Batches run at once on several threads each use their own width."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        line = json.dumps({"id": 1, "markdown": "word " * 40}) + "\n"
+        widths = [20, 30, 40, 50] * 5
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(
+                pool.map(lambda width: self.run([line] * 20, width=width), widths)
+            )
+        for width, records in zip(widths, results):
+            expected = render_ansi("word " * 40, width)
+            assert all(record["ansi"] == expected for record in records)
+
+    def test_cli_jsonl(self):
+        """The --jsonl option reads records from stdin."""
+        runner = CliRunner()
+        result = runner.invoke(
+            main, ["--jsonl"], input=json.dumps(self.RECORDS[0]) + "\n"
+        )
+        assert result.exit_code == 0
+        record = json.loads(result.output)
+        assert record["id"] == "a"
+        assert "Title" in record["ansi"]
+
+
+class TestThreadSafety:
+    """Test renders sharing the parser, theme and caches across threads."""
+
+    # Tables, code, wide characters and styles exercise every shared cache
+    DOCUMENTS = [
+        f"## Report {i}\n\n| Name | 名前 | Count |\n|------|------|------:|\n"
+        + "".join(f"| row {j} | 行{j} | **{i * j}** |\n" for j in range(i % 5 + 1))
+        + f"\n```{('python', 'js', 'rust', 'text')[i % 4]}\nx = {i}\n```\n\n"
+        f"> Quoted *item* {i} with `code` and a [link](https://example.com/{i}).\n"
+        for i in range(40)
+    ]
+
+    @pytest.fixture
+    def contended(self, monkeypatch):
+        """Switch threads often, with caches small enough to evict constantly."""
+        import md2term
+
+        for name in ("_HIGHLIGHT_CACHE", "_TABLE_LAYOUTS", "_TEXT_WIDTHS"):
+            monkeypatch.setattr(md2term, name, {})
+        monkeypatch.setattr(md2term, "_SGR_CODES", {})
+        monkeypatch.setattr(md2term, "_LEXER_CACHE", {})
+        monkeypatch.setattr(md2term, "_OPEN_FENCE_HIGHLIGHTS", [])
+        monkeypatch.setattr(md2term, "_HIGHLIGHT_CACHE_LIMIT", 2)
+        monkeypatch.setattr(md2term, "_TABLE_LAYOUT_LIMIT", 2)
+        monkeypatch.setattr(md2term, "_TEXT_WIDTHS_LIMIT", 2)
+        monkeypatch.setattr(md2term, "_SGR_CODES_LIMIT", 2)
+        monkeypatch.setattr(md2term, "_LEXER_CACHE_LIMIT", 2)
+        monkeypatch.setattr(md2term, "_OPEN_FENCE_HIGHLIGHTS_LIMIT", 2)
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        yield
+        sys.setswitchinterval(interval)
+
+    def test_shared_renderer_matches_serial_renders(self, contended):
+        """One AnsiRenderer used from a thread pool renders like serial calls."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        import md2term
+
+        renderer = md2term.AnsiRenderer(width=60, color_system="truecolor")
+        expected = [renderer.render(document) for document in self.DOCUMENTS]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for _ in range(3):
+                assert list(pool.map(renderer.render, self.DOCUMENTS)) == expected
+
+    def test_concurrent_streams_match_serial_streams(self, contended):
+        """Streams drawn on separate threads share open-fence highlights safely."""
+        codes = [
+            "```python\n" + "".join(f"value_{i} = {j} * {i}\n" for j in range(30))
+            for i in range(6)
+        ]
+
+        def stream(code):
+            output = io.StringIO()
+            # Frames slowed by contention must not be degraded
+            renderer = StreamingRenderer(
+                create_test_console(output), frame_budget=float("inf")
+            )
+            for line in code.splitlines(keepends=True):
+                renderer.add_text(line)
+                renderer._render_current_state()
+            renderer.finalize()
+            return output.getvalue()
+
+        expected = [stream(code) for code in codes]
+        results = [None] * len(codes)
+
+        def run(i):
+            results[i] = stream(codes[i])
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(codes))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == expected
+
+    def test_streaming_renderer_accepts_text_from_threads(self, contended):
+        """Text added from several threads at once is neither lost nor torn."""
+        output = io.StringIO()
+        renderer = StreamingRenderer(create_test_console(output))
+
+        def produce(n):
+            for i in range(50):
+                renderer.add_text(f"Stream {n} line {i}.\n\n")
+
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        renderer.finalize()
+
+        paragraphs = renderer.buffer.split("\n\n")[:-1]
+        assert len(paragraphs) == 200
+        assert sorted(paragraphs) == sorted(
+            f"Stream {n} line {i}." for n in range(4) for i in range(50)
+        )
+
+
+class FakeClock:
+    """Stands in for the time module so frame timing is deterministic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    perf_counter = monotonic = time
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestWorkCounts:
+    """Count the work done for scripted sessions over large_test.md.
+
+    Counts are snapshotted instead of timing anything, so a change that
+    re-parses the whole buffer per frame or renders a block twice fails
+    deterministically.
+    """
+
+    # Every chunk is due a frame, and each frame redraws the whole buffer
+    CHUNK_SIZE = 500
+    CHUNK_INTERVAL = 0.1
+    LINE_INTERVAL = 0.02
+
+    # Every item after a blank line, with an indented paragraph now and then
+    LOOSE_LIST = "".join(
+        f"- Item {i} with **bold** text\n\n"
+        + ("  A second paragraph.\n\n" if i % 10 == 0 else "")
+        for i in range(300)
+    )
+
+    @pytest.fixture
+    def counts(self, monkeypatch):
+        import md2term
+        from pygments.lexer import Lexer
+
+        counts = {
+            "parses": 0,
+            "parsed_chars": 0,
+            "consoles": 0,
+            "lexes": 0,
+            "lexed_chars": 0,
+        }
+        parse = md2term._PARSER.parse
+        get_tokens = Lexer.get_tokens
+
+        def counting_parse(text, state=None):
+            counts["parses"] += 1
+            counts["parsed_chars"] += len(text)
+            return parse(text, state)
+
+        console_init = Console.__init__
+
+        def counting_console_init(console, *args, **kwargs):
+            counts["consoles"] += 1
+            console_init(console, *args, **kwargs)
+
+        def counting_get_tokens(lexer, text, *args, **kwargs):
+            counts["lexes"] += 1
+            counts["lexed_chars"] += len(text)
+            return get_tokens(lexer, text, *args, **kwargs)
+
+        monkeypatch.setattr(md2term._PARSER, "parse", counting_parse)
+        monkeypatch.setattr(Console, "__init__", counting_console_init)
+        monkeypatch.setattr(Lexer, "get_tokens", counting_get_tokens)
+        monkeypatch.setattr(md2term, "time", FakeClock())
+        # Start every session from cold caches
+        monkeypatch.setattr(md2term, "_HIGHLIGHT_CACHE", {})
+        monkeypatch.setattr(md2term, "_TABLE_LAYOUTS", {})
+        monkeypatch.setattr(md2term, "_OPEN_FENCE_HIGHLIGHTS", [])
+        return counts
+
+    def read_large_test(self):
+        with open("large_test.md", encoding="utf-8") as f:
+            return f.read()
+
+    def test_streaming_session(self, counts, snapshot):
+        """Fixed-size chunks at a fixed interval through StreamingRenderer."""
+        import md2term
+
+        text = self.read_large_test()
+        output = io.StringIO()
+        renderer = StreamingRenderer(md2term.make_console(80, "256", output))
+        for start in range(0, len(text), self.CHUNK_SIZE):
+            md2term.time.sleep(self.CHUNK_INTERVAL)
+            renderer.add_text(text[start : start + self.CHUNK_SIZE])
+        renderer.finalize()
+        counts["bytes_written"] = len(output.getvalue().encode("utf-8"))
+        assert counts == snapshot
+
+    def test_block_session(self, counts, snapshot, capsys):
+        """The same document, line by line, through process_block_stream."""
+        process_block_stream(io.StringIO(self.read_large_test()), width=80)
+        counts["bytes_written"] = len(capsys.readouterr().out.encode("utf-8"))
+        assert counts == snapshot
+
+    def test_line_session(self, counts, snapshot, capsys):
+        """The same document, a line at a time, through process_stream."""
+        import md2term
+
+        def lines():
+            for line in self.read_large_test().splitlines(keepends=True):
+                md2term.time.sleep(self.LINE_INTERVAL)
+                yield line
+
+        process_stream(lines(), width=80)
+        counts["bytes_written"] = len(capsys.readouterr().out.encode("utf-8"))
+        assert counts == snapshot
+
+    def test_loose_list_block_session(self, counts, snapshot, capsys):
+        """A loose list, held until it ends, through process_block_stream."""
+        process_block_stream(io.StringIO(self.LOOSE_LIST), width=80)
+        counts["bytes_written"] = len(capsys.readouterr().out.encode("utf-8"))
+        assert counts == snapshot
+
+    def test_loose_list_streaming_session(self, counts, snapshot):
+        """The same loose list in fixed-size chunks through StreamingRenderer."""
+        import md2term
+
+        output = io.StringIO()
+        renderer = StreamingRenderer(md2term.make_console(80, "256", output))
+        for start in range(0, len(self.LOOSE_LIST), self.CHUNK_SIZE):
+            md2term.time.sleep(self.CHUNK_INTERVAL)
+            renderer.add_text(self.LOOSE_LIST[start : start + self.CHUNK_SIZE])
+        renderer.finalize()
+        counts["bytes_written"] = len(output.getvalue().encode("utf-8"))
+        assert counts == snapshot
+
+    def test_batch_render(self, counts, snapshot):
+        """The whole document rendered once."""
+        import md2term
+
+        output = io.StringIO()
+        render_markdown(md2term.make_console(80, "256", output), self.read_large_test())
+        counts["bytes_written"] = len(output.getvalue().encode("utf-8"))
+        assert counts == snapshot
+
 
 # Legacy tests for compatibility
 def test_convert_basic():